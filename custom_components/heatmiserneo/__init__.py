@@ -1,21 +1,33 @@
 # SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
 import asyncio
-from .const import DOMAIN, HUB, COORDINATOR, HEATMISER_HUB_PRODUCT_LIST
-from datetime import timedelta
+from .const import (
+    DOMAIN,
+    HUB,
+    HUB_MANAGER,
+    COORDINATOR,
+    HEATMISER_HUB_PRODUCT_LIST,
+    NTP_RETRY_ATTEMPTS,
+    NTP_RETRY_INTERVAL,
+)
 from homeassistant import config_entries
-from homeassistant.const import CONF_HOST, CONF_PORT
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_API_TOKEN, CONF_HOST, CONF_PORT, EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import device_registry as dr
-from homeassistant.helpers.update_coordinator import (CoordinatorEntity, DataUpdateCoordinator)
-from neohubapi.neohub import NeoHub
+from .coordinator import HeatmiserNeoCoordinator, async_remove_snapshot
+from .manager import HeatmiserNeoHubManager
+from neohubapi.neohub import NeoHubConnectionError
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+PLATFORMS = ["button", "climate", "sensor", "switch"]
+
 
 async def async_setup(hass, config):
     """Set up Heatmiser Neo components."""
     hass.data.setdefault(DOMAIN, {})
+    # Shared by every hub, so that polls and requests are spread across them.
+    hass.data[DOMAIN][HUB_MANAGER] = HeatmiserNeoHubManager()
 
     return True
 
@@ -26,105 +38,124 @@ async def async_setup_entry(hass, entry):
     # Set the Hub up to use and save
     host = entry.data[CONF_HOST]
     port = entry.data[CONF_PORT]
+    # Entries created before token support was added have no token, an empty token means the legacy API.
+    token = entry.data.get(CONF_API_TOKEN) or None
     # Make this configurable or retrieve from an API later.
     hub_serial_number = f"NEOHUB-SN:000000-{host}"
-    hub = NeoHub(host, port)
+    # With a token neohubapi talks to the hub over a single persistent WebSocket instead of a socket per request.
+    manager = hass.data[DOMAIN][HUB_MANAGER]
+    hub = manager.create_hub(entry.entry_id, host, port, token=token)
+    entry.async_on_unload(lambda: manager.remove(entry.entry_id))
 
     # TODO: Split this out to it's own HUB / Bridge thing.
-    _LOGGER.debug(f"Attempting to setup Heatmiser Neo Hub Device: {host}:{port}")
-    init_system_data = await hub.get_system()
-    _LOGGER.debug(f"system_data: {init_system_data}")
-
-    device_registry = dr.async_get(hass)
-    device_registry.async_get_or_create(
-        config_entry_id=entry.entry_id,
-        identifiers={(DOMAIN, hub_serial_number)},
-        manufacturer="Heatmiser",
-        model=f"{HEATMISER_HUB_PRODUCT_LIST[init_system_data.HUB_TYPE]}",
-        name=f"NeoHub - {host}",
-        serial_number=hub_serial_number,
-        sw_version=init_system_data.HUB_VERSION
-    )
-
-    # TODO: NTP Fixes as per below.
-    """"
-    TODO: Make this configurable, and move it from here
-    workaround to re-enable NTP after a power outage (or any other reason) 
-    where WAN connectivity will not have been restored by the time the NeoHub has fully started.
-    """
-    if getattr(init_system_data, "NTP_ON") != "Running":
-
-        """ Enable NTP """
-        _LOGGER.warning(f"NTP disabled. Enabling")
-
-        set_ntp_enabled_task = asyncio.create_task(hub.set_ntp(True))
-        response = await set_ntp_enabled_task
-        if response:
-            _LOGGER.info(f"Enabled NTP (response: {response})")
-    else:
-        _LOGGER.debug(f"NTP enabled")
+    _LOGGER.debug(f"Attempting to setup Heatmiser Neo Hub Device: {host}:{port} (token: {token is not None})")
+    coordinator = HeatmiserNeoCoordinator(hass, entry, hub, host)
+
+    coordinator.serial_number = hub_serial_number
+    manager.add_coordinator(entry.entry_id, coordinator)
+    async def async_save_snapshot_on_stop(_event):
+        await coordinator.async_save_snapshot()
 
+    # Entries aren't unloaded when Home Assistant stops, so save the latest snapshot then too.
+    entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_save_snapshot_on_stop))
 
-    async def async_update_data():
-        """Fetch data from the Hub all at once and make it available for all devices."""
-        _LOGGER.info("Executing update_data()")
-        async with asyncio.timeout(30):
-            system_data = await hub.get_system()
-            devices_data = await hub.get_devices_data()
-            device_serial_numbers = await hub.devices_sn()
+    # Store hub and coordinator per entry_id
+    hass.data[DOMAIN][entry.entry_id] = {
+        HUB: hub,
+        COORDINATOR: coordinator,
+    }
 
-            _LOGGER.debug(f"system_data: {system_data}")
-            _LOGGER.debug(f"devices_data: {devices_data}")
-            _LOGGER.debug(f"device_serial_numbers: {device_serial_numbers}")
+    ntp_task = None
+
+    @callback
+    def async_register_hub_device(system_data):
+        """Add the hub to the device registry, or update its firmware version."""
+        dr.async_get(hass).async_get_or_create(
+            config_entry_id=entry.entry_id,
+            identifiers={(DOMAIN, hub_serial_number)},
+            manufacturer="Heatmiser",
+            model=f"{HEATMISER_HUB_PRODUCT_LIST[system_data.HUB_TYPE]}",
+            name=f"NeoHub - {host}",
+            serial_number=hub_serial_number,
+            sw_version=system_data.HUB_VERSION
+        )
+
+    @callback
+    def async_system_data_fetched(system_data):
+        """Update the hub device, and check NTP, with the system data the hub has just reported."""
+        nonlocal ntp_task
+        _LOGGER.debug(f"system_data: {system_data}")
+        async_register_hub_device(system_data)
+
+        # TODO: NTP Fixes as per below.
+        """"
+        TODO: Make this configurable
+        workaround to re-enable NTP after a power outage (or any other reason) 
+        where WAN connectivity will not have been restored by the time the NeoHub has fully started.
+        """
+        if getattr(system_data, "NTP_ON") != "Running":
+            if ntp_task is not None and not ntp_task.done():
+                return
+            _LOGGER.warning(f"NTP disabled. Enabling")
+            # Don't hold up refreshes waiting for the hub, it is retried in the background.
+            ntp_task = entry.async_create_background_task(hass, async_enable_ntp(hub), f"Enable NTP on NeoHub {host}")
+        else:
+            _LOGGER.debug(f"NTP enabled")
+
+    # Checked against what the hub reports, the snapshot's system data may be out of date.
+    entry.async_on_unload(coordinator.add_system_listener(async_system_data_fetched))
+
+    if await coordinator.async_restore_snapshot():
+        # Set up from the snapshot straight away, the entities are updated as soon as the hub answers.
+        _, snapshot_system_data = coordinator.data
+        async_register_hub_device(snapshot_system_data)
+        entry.async_create_background_task(hass, coordinator.async_refresh(), f"First refresh of NeoHub {host}")
+    else:
+        # The first refresh fetches the system data along with everything else, rather than asking for it separately.
+        await coordinator.async_config_entry_first_refresh()
 
-            ## Adding Serial numbers to device data.
-            # Convert device_serial_numbers (SimpleNamespace) to a dictionary
-            device_serial_numbers_dict = vars(device_serial_numbers)
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(options_update_listener))
 
-            # Loop through devices and append serial numbers to _simple_attrs
-            for device in devices_data['neo_devices']:
-                device_id = device._data_.DEVICE_ID  # Get the device ID from the _data_ namespace
+    return True
 
-                # Find the corresponding serial number from the dictionary using the DEVICE_ID
-                matching_serials = [
-                    serial[1] for serial in device_serial_numbers_dict.values() if serial[0] == device_id
-                ]
 
-                # If any matching serials are found, assign the first one, else set to "UNKNOWN"
-                serial_number = matching_serials[0] if matching_serials else "UNKNOWN"
+async def async_enable_ntp(hub):
+    """Enable NTP on the hub, retrying until the hub confirms it."""
+    for attempt in range(1, NTP_RETRY_ATTEMPTS + 1):
+        try:
+            response = await hub.set_ntp(True)
+        except (asyncio.TimeoutError, OSError, NeoHubConnectionError) as err:
+            response = None
+            _LOGGER.debug(f"Enabling NTP failed on attempt {attempt}: {err}")
 
-                # Create a new tuple that includes the serial number in _simple_attrs
-                if 'serial_number' not in device._simple_attrs:
-                    device._simple_attrs = tuple(list(device._simple_attrs) + ['serial_number'])
+        if response:
+            _LOGGER.info(f"Enabled NTP (response: {response})")
+            return
 
-                # Dynamically set the serial_number as an attribute of the _data_ object
-                setattr(device, 'serial_number', serial_number)
+        await asyncio.sleep(NTP_RETRY_INTERVAL)
 
-            return devices_data, system_data
+    _LOGGER.warning(f"Could not enable NTP after {NTP_RETRY_ATTEMPTS} attempts")
 
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name=f"Heatmiser NeoHub : {host}",
-        update_method=async_update_data,
-        update_interval=timedelta(seconds=30),
-        always_update=True
-    )
 
-    coordinator.serial_number = hub_serial_number
+async def async_unload_entry(hass, entry):
+    """Unload a config entry, stopping the refreshes and closing the connection to the hub."""
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await entry_data[COORDINATOR].async_shutdown()
+        await entry_data[HUB].async_close()
 
-    # Store hub and coordinator per entry_id
-    hass.data[DOMAIN][entry.entry_id] = {
-        HUB: hub,
-        COORDINATOR: coordinator,
-    }
+    return unload_ok
 
-    await coordinator.async_config_entry_first_refresh()
-    await hass.config_entries.async_forward_entry_setups(entry, ["button", "climate", "sensor", "switch"])
 
-    return True
+async def async_remove_entry(hass, entry):
+    """Remove the stored snapshot when the config entry is deleted."""
+    await async_remove_snapshot(hass, entry.entry_id)
 
 
 async def options_update_listener(hass: HomeAssistant, config_entry: config_entries.ConfigEntry):
     """Handle options update."""
-    await hass.config_entries.async_reload(config_entry.entry_id)
+    # The HVAC modes and polling interval are read as they are used, so there's no need to reload the integration.
+    coordinator = hass.data[DOMAIN][config_entry.entry_id][COORDINATOR]
+    coordinator.async_apply_options()
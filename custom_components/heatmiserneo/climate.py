@@ -9,7 +9,7 @@ Heatmiser NeoStat control via Heatmiser Neo-hub
 
 import logging
 import asyncio
-from collections import OrderedDict
+from datetime import timedelta
 
 import voluptuous as vol
 
@@ -17,7 +17,9 @@ from homeassistant.components.climate import (
     ATTR_TARGET_TEMP_HIGH,
     ATTR_TARGET_TEMP_LOW,
     FAN_AUTO,
-    FAN_ON,
+    FAN_HIGH,
+    FAN_LOW,
+    FAN_MEDIUM,
     PRESET_AWAY,
     PRESET_NONE,
     ClimateEntity,
@@ -28,20 +30,21 @@ from homeassistant.components.climate import (
 )
 
 from homeassistant.const import ATTR_TEMPERATURE
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from neohubapi.neohub import NeoHub, NeoStat, HCMode
-from .const import DOMAIN, HUB, COORDINATOR, CONF_HVAC_MODES, HEATMISER_PRODUCT_LIST
+from neohubapi.neohub import NeoHub, HCMode
+from .const import DOMAIN, HUB, COORDINATOR, CONF_HVAC_MODES, AvailableMode, DeviceCapability
+from .entity import HeatmiserNeoEntity
+from .models import NeoDevice
 
 from .const import (
     ATTR_HOLD_DURATION,
     ATTR_HOLD_TEMPERATURE,
+    HVAC_MODES_BY_AVAILABLE_MODE,
     SERVICE_HOLD_OFF,
     SERVICE_HOLD_ON,
 )
@@ -52,6 +55,22 @@ _LOGGER = logging.getLogger(__name__)
 SUPPORT_FLAGS = 0
 THERMOSTATS = "thermostats"
 
+HVAC_MODES_BY_HC_MODE = {
+    HCMode.AUTO.value: HVACMode.HEAT_COOL,
+    HCMode.COOLING.value: HVACMode.COOL,
+    HCMode.HEATING.value: HVACMode.HEAT,
+    HCMode.VENT.value: HVACMode.FAN_ONLY,
+}
+
+# The SET_FAN_SPEED values for the fan modes of HC thermostats, picking AUTO hands the speed back to the thermostat.
+FAN_SPEEDS_BY_FAN_MODE = {
+    FAN_AUTO: "AUTO",
+    FAN_LOW: "LOW",
+    FAN_MEDIUM: "MEDIUM",
+    FAN_HIGH: "HIGH",
+}
+FAN_MODES = list(FAN_SPEEDS_BY_FAN_MODE)
+
 async def async_setup_entry(hass, entry, async_add_entities):
     hub = hass.data[DOMAIN][entry.entry_id][HUB]
     coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
@@ -61,24 +80,16 @@ async def async_setup_entry(hass, entry, async_add_entities):
         return
 
     devices_data, system_data = coordinator.data
-    thermostats = {device.name: device for device in devices_data['neo_devices']}
-
-    hvac_config = (
-        entry.options[CONF_HVAC_MODES] if CONF_HVAC_MODES in entry.options else {}
-    )
-    _LOGGER.debug(f"hvac_config: {hvac_config}")
-    for config in hvac_config:
-        _LOGGER.debug(
-            f"Overriding the default HVAC modes from {thermostats[config].available_modes} to {hvac_config[config]} for the {config} climate entity."
-        )
-        thermostats[config].available_modes = hvac_config[config]
+    thermostats = devices_data['neo_devices_by_name']
 
     temperature_unit = system_data.CORF
-    temperature_step = await hub.target_temperature_step
+    # Worked out as neohubapi's target_temperature_step does, but from the system data rather than asking the hub for
+    # its firmware version, which would fail when set up from the snapshot while the hub can't be reached.
+    temperature_step = 0.5 if system_data.HUB_VERSION >= 2135 else 1
 
     entities = []
     for device in thermostats.values():
-        if device.device_type in [1, 2, 7, 8, 9, 11, 12, 13, 15, 17]:
+        if DeviceCapability.HEAT in device.capabilities:
             if not device.time_clock_mode:
                 entities.append(NeoStatEntity(device, coordinator, hub, temperature_unit, temperature_step))
 
@@ -103,42 +114,44 @@ async def async_setup_entry(hass, entry, async_add_entities):
     )
 
 
-class NeoStatEntity(CoordinatorEntity, ClimateEntity):
+class NeoStatEntity(HeatmiserNeoEntity, ClimateEntity):
     """Represents a Heatmiser neoStat thermostat."""
 
+    _unique_id_suffix = "heatmiser_neostat"
     _enable_turn_on_off_backwards_compatibility = False
+    # Fixed for a device, so there's no need to store them with every state change.
+    _unrecorded_attributes = frozenset({'device_type', 'hc_mode', 'sensor_mode'})
 
     def __init__(
             self,
-            neostat: NeoStat,
+            neostat: NeoDevice,
             coordinator: DataUpdateCoordinator,
             hub: NeoHub,
             unit_of_measurement,
             temperature_step
     ):
-
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {neostat}")
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-        self._hub = hub
+        super().__init__(neostat, coordinator, hub)
         self._unit_of_measurement = unit_of_measurement
         self._target_temperature_step = temperature_step
-        self._hvac_modes = []
-        if hasattr(neostat, "standby"):
-            self._hvac_modes.append(HVACMode.OFF)
-        # The following devices support Heating modes
-        if self.data.device_type in [1, 2, 7, 8, 9, 11, 12, 13, 15, 17]:
-            self._hvac_modes.append(HVACMode.HEAT)
-        # Todo: Add support for other modes per device type.
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        neo_devices = {device.name: device for device in devices['neo_devices']}
-        return neo_devices[self.name]
+        # The attributes only change when the device does, and devices are replaced rather than changed.
+        self._attributes = None
+        self._attributes_device = None
+        # Worked out again only if the hub reports different modes for the device.
+        self._hvac_modes = None
+        self._hvac_modes_key = None
+
+    @staticmethod
+    def _default_hvac_modes(device: NeoDevice):
+        """Return the HVAC modes of a device, HC thermostats have the modes the hub reports for them."""
+        hvac_modes = [HVACMode.OFF]
+        if DeviceCapability.COOL in device.capabilities and device.available_modes:
+            available_modes = {str(mode).lower() for mode in device.available_modes}
+            hvac_modes.extend(
+                HVAC_MODES_BY_AVAILABLE_MODE[mode] for mode in AvailableMode if mode.value in available_modes
+            )
+        elif DeviceCapability.HEAT in device.capabilities:
+            hvac_modes.append(HVACMode.HEAT)
+        return hvac_modes
 
     async def async_set_hvac_mode(self, hvac_mode):
         """Set hvac mode."""
@@ -149,65 +162,102 @@ class NeoStatEntity(CoordinatorEntity, ClimateEntity):
         if hvac_mode == HVACMode.HEAT:
             hc_mode = HCMode.HEATING
         elif hvac_mode == HVACMode.COOL:
-            hc_mode = HVACMode.COOLING
+            hc_mode = HCMode.COOLING
         elif hvac_mode == HVACMode.HEAT_COOL:
             hc_mode = HCMode.AUTO
         elif hvac_mode == HVACMode.FAN_ONLY:
             hc_mode = HCMode.VENT
 
+        # Only send the commands needed to get from the current state to the new one.
+        commands = []
+        if hvac_mode == HVACMode.OFF:
+            if not self.data.standby:
+                commands.append(("set_frost", True, self._hub.set_frost(True, [self.data]), {"standby": True}))
+        else:
+            if self.data.standby:
+                commands.append(("set_frost", False, self._hub.set_frost(False, [self.data]), {"standby": False}))
+            if hc_mode is not None and self.data.hc_mode != hc_mode.value:
+                commands.append(("set_hc_mode", hc_mode, self._hub.set_hc_mode(hc_mode, [self.data]), {"hc_mode": hc_mode.value}))
 
-        if hvac_mode != HVACMode.OFF:
-            frost_mode = False  # Standby Mode False
+        await self._async_send_commands(commands)
 
-            set_frost_task = asyncio.create_task(self._neostat.set_frost(frost_mode))
-            response = await set_frost_task
-            _LOGGER.info(f"{self.name} : Called set_frost() with: {frost_mode} (response: {response})")
+    async def async_set_fan_mode(self, fan_mode):
+        """Set the fan mode of an HC thermostat."""
+        _LOGGER.info(f"{self.name} : Executing set_fan_mode() with: {fan_mode}")
 
-            set_hc_mode_task = asyncio.create_task(self._neostat.set_hc_mode(hc_mode))
-            response = await set_hc_mode_task
-            _LOGGER.info(f"{self.name} : Called set_hc_mode() with: {hc_mode} (response: {response})")
-        else:
-            frost_mode = True # Turn on Standby Mode
-            set_frost_task = asyncio.create_task(self._neostat.set_frost(frost_mode))
-            response = await set_frost_task
-            _LOGGER.info(f"{self.name} : Called set_frost() with: {frost_mode} (response: {response})")
+        if fan_mode not in FAN_SPEEDS_BY_FAN_MODE:
+            raise ServiceValidationError(f"{self.name} : Unsupported fan mode {fan_mode}, expected one of {FAN_MODES}")
+
+        commands = []
+        if fan_mode != self.fan_mode:
+            fan_speed = FAN_SPEEDS_BY_FAN_MODE[fan_mode]
+            if fan_mode == FAN_AUTO:
+                changes = {"fan_control": "Automatic"}
+            else:
+                changes = {"fan_control": "Manual", "fan_speed": fan_speed.capitalize()}
+            commands.append(("set_fan_speed", fan_speed, self._hub.set_fan_speed(fan_speed, [self.data]), changes))
+
+        await self._async_send_commands(commands)
 
     async def async_set_temperature(self, **kwargs):
         """Set new target temperature."""
         _LOGGER.info(f"{self.name} : Executing set_temperature() with: {kwargs}")
         _LOGGER.debug(f"self.data: {self.data}")
 
-        low_temp = kwargs.get(ATTR_TEMPERATURE) or kwargs.get(ATTR_TARGET_TEMP_LOW)
+        low_temp = kwargs.get(ATTR_TARGET_TEMP_LOW)
         high_temp = kwargs.get(ATTR_TARGET_TEMP_HIGH)
+        if kwargs.get(ATTR_TEMPERATURE) is not None:
+            # While cooling the single target temperature is the cooling one.
+            if self.hvac_mode == HVACMode.COOL:
+                high_temp = kwargs[ATTR_TEMPERATURE]
+            else:
+                low_temp = kwargs[ATTR_TEMPERATURE]
+
+        commands = []
+        if low_temp is not None and float(low_temp) != self.data.target_temperature:
+            commands.append((
+                "set_target_temperature", low_temp, self._hub.set_target_temperature(low_temp, [self.data]),
+                {"target_temperature": float(low_temp)}
+            ))
+        if high_temp is not None and float(high_temp) != self.data.cool_temp:
+            commands.append((
+                "set_cool_temp", high_temp, self._hub.set_cool_temp(high_temp, [self.data]),
+                {"cool_temp": float(high_temp)}
+            ))
+
+        await self._async_send_commands(commands)
+
+    async def _async_send_commands(self, commands):
+        """
+        Send independent commands to the hub together and optimistically apply the changes the hub confirmed.
 
-        set_target_temperature_task = asyncio.create_task(
-            self._neostat.set_target_temperature(low_temp)
-        )
-        response = await set_target_temperature_task
-        if response:
-            _LOGGER.info(
-                f"{self.name} : Called set_target_temperature with: {low_temp} (response: {response})"
-            )
-
-        set_target_cool_temperature_task = asyncio.create_task(
-            self._neostat.set_cool_temp(high_temp)
-        )
-        response = await set_target_cool_temperature_task
-        if response:
-            _LOGGER.info(
-                f"{self.name} : Called set_cool_temp with: {high_temp} (response: {response})"
-            )
-
-        # The change of target temperature may trigger a change in the current hvac_action
-        # so we schedule a refresh to get new data asap.
-        await self._coordinator.async_request_refresh()
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
+        Each command is a (name, value, coroutine, changes) tuple. There is no request for a single zone's data, so
+        rather than refreshing every device, the change is shown straight away and confirmed by the next poll, which the
+        coordinator brings forward after any command.
+        """
+        if not commands:
+            _LOGGER.debug(f"{self.name} : Already in the requested state, nothing to send")
+            return
+
+        responses = await asyncio.gather(*(command for _, _, command, _ in commands), return_exceptions=True)
+
+        error = None
+        confirmed_changes = {}
+        for (name, value, _, changes), response in zip(commands, responses):
+            if isinstance(response, Exception):
+                _LOGGER.error(f"{self.name} : Failed to call {name}() with: {value} ({response})")
+                error = error or response
+            elif not response:
+                _LOGGER.warning(f"{self.name} : Called {name}() with: {value} but the hub did not confirm it")
+            else:
+                _LOGGER.info(f"{self.name} : Called {name}() with: {value} (response: {response})")
+                confirmed_changes.update(changes)
+
+        if confirmed_changes:
+            self._coordinator.async_patch_device(self.data.device_id, **confirmed_changes)
+
+        if error is not None:
+            raise error
 
     @property
     def current_temperature(self):
@@ -215,56 +265,30 @@ class NeoStatEntity(CoordinatorEntity, ClimateEntity):
         if self.data.offline:
             return None
 
-        # Checking for unreasonable temperatures, happens on hub disconnection.
-        # Centigrade
-        if (float(self.data.temperature) < -50.0 or float(self.data.temperature) > 70.0) and self._unit_of_measurement == "C":
-            _LOGGER.error(
-                f"Error: Climate entity '{self._neostat.name}' has an invalid current_temperature value: "
-                f"{self.data.temperature} degrees Centigrade, Hub lost connection?"
-            )
-            return None
-
-        # Fahrenheit
-        if (float(self.data.temperature) < -58.0 or float(self.data.temperature) > 158.0) and self._unit_of_measurement == "F":
-            _LOGGER.error(
-                f"Error: Climate entity '{self._neostat.name}' has an invalid current_temperature value: "
-                f"{self.data.temperature} degrees Fahrenheit, Hub lost connection?"
-            )
-            return None
-
-        return float(self.data.temperature)
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "model": f"{HEATMISER_PRODUCT_LIST[self.data.device_type]}",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "sw_version": self.data.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
+        # Out of range readings, which happen when the hub loses its connection, were dropped by the coordinator.
+        return self.data.temperature
 
     @property
     def extra_state_attributes(self):
         """Return the additional state attributes."""
-        attributes = OrderedDict()
-
-        attributes['device_type'] = self.data.device_type
-        attributes['low_battery'] = self.data.low_battery
-        attributes['offline'] = self.data.offline
-        attributes['standby'] = self.data.standby
-        attributes['hold_on'] = self.data.hold_on
-        attributes['hold_time'] = ':'.join(str(self.data.hold_time).split(':')[:2])
-        attributes['hold_temp'] = self.data.hold_temp
-        attributes['floor_temperature'] = self.data.current_floor_temperature
-        attributes['preheat_active'] = self.data.preheat_active
-        attributes['hc_mode'] = self.data.hc_mode
-        attributes['sensor_mode'] = self.data.sensor_mode
-
-        return attributes
+        device = self.data
+        if device is not self._attributes_device:
+            self._attributes_device = device
+            self._attributes = {
+                'device_type': device.device_type,
+                'low_battery': device.low_battery,
+                'offline': device.offline,
+                'standby': device.standby,
+                'hold_on': device.hold_on,
+                'hold_time': device.hold_time_text,
+                'hold_temp': device.hold_temp,
+                'floor_temperature': device.current_floor_temperature,
+                'preheat_active': device.preheat_active,
+                'hc_mode': device.hc_mode,
+                'sensor_mode': device.sensor_mode,
+            }
+
+        return self._attributes
 
     @property
     def name(self):
@@ -283,7 +307,7 @@ class NeoStatEntity(CoordinatorEntity, ClimateEntity):
             return HVACAction.COOLING
         elif self.data.heat_on:
             return HVACAction.HEATING
-        elif self.data.fan_speed != "Off":
+        elif self.data.fan_speed not in (None, "Off"):
             return HVACAction.FAN  # Should fan be combined? Ie can you have fan on and other functions together?
         else:
             return HVACAction.IDLE
@@ -293,19 +317,25 @@ class NeoStatEntity(CoordinatorEntity, ClimateEntity):
         """Return The current operation (e.g. heat, cool, idle). Used to determine state."""
         if self.data.standby:
             return HVACMode.OFF
-        elif self.data.hc_mode == "COOLING":
-            return HVACMode.COOL
-        elif self.data.hc_mode == "HEATING":
-            return HVACMode.HEAT
-        elif self.data.hc_mode == "AUTO":
-            return HVACMode.HEAT_COOL
-        elif self.data.hc_mode == "VENT":
-            return HVACMode.FAN_ONLY
+        return HVAC_MODES_BY_HC_MODE.get(self.data.hc_mode)
 
     @property
     def hvac_modes(self):
-        """Return the list of available operation modes."""
-        return self._hvac_modes
+        """Return the list of available operation modes, these can be overridden in the integration's options."""
+        # Asked for even while the entity is unavailable, when the device might no longer be reported.
+        device = self.data or self._neostat
+        hvac_modes_key = (device.capabilities, device.available_modes)
+        if hvac_modes_key != self._hvac_modes_key:
+            self._hvac_modes_key = hvac_modes_key
+            self._hvac_modes = self._default_hvac_modes(device)
+
+        hvac_config = self.platform.config_entry.options.get(CONF_HVAC_MODES, {})
+        if self.unique_id not in hvac_config:
+            return self._hvac_modes
+
+        hvac_modes = [HVACMode.OFF]
+        hvac_modes.extend(HVAC_MODES_BY_AVAILABLE_MODE[mode] for mode in hvac_config[self.unique_id])
+        return hvac_modes
 
     async def set_hold(self, hold_duration: object, hold_temperature: float):
         """
@@ -349,51 +379,74 @@ class NeoStatEntity(CoordinatorEntity, ClimateEntity):
         # Optimistically update the mode so that the UI feels snappy.
         # The value will be confirmed next time we get new data.
 
-        self.data.hold_on = True
-        self.data.hold_time = str(f"{str(hold_hours)}:{str(hold_minutes).ljust(2, '0')}")
-        self.data.hold_temp = float(hold_temperature)
-        self.async_schedule_update_ha_state(False)
+        self._coordinator.async_patch_device(
+            self.data.device_id,
+            hold_on=True,
+            hold_time=timedelta(hours=hold_hours, minutes=hold_minutes),
+            hold_temp=float(hold_temperature),
+        )
 
         return result
 
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
     @property
     def supported_features(self):
         """Return the list of supported features."""
-        # Do this based on device type
-
         # All thermostats should have on and off
         supported_features = ClimateEntityFeature.TURN_ON | ClimateEntityFeature.TURN_OFF
 
-        # TODO: Add the rest of the thermostat models here
-        if self.data.device_type in [1, 2, 7, 8, 9, 11, 12, 13, 15, 17]:
-            # Heatmiser NeoStat v1, NeoStat V2
+        device = self.data or self._neostat
+        if DeviceCapability.HEAT in device.capabilities:
             supported_features = supported_features | ClimateEntityFeature.TARGET_TEMPERATURE
-
-        elif self.data.device_type == 11:
-            # neoStat-HC
-            supported_features = supported_features | ClimateEntityFeature.TARGET_TEMPERATURE | ClimateEntityFeature.FAN_MODE
+        if DeviceCapability.COOL in device.capabilities:
+            supported_features = supported_features | ClimateEntityFeature.TARGET_TEMPERATURE_RANGE
+        if self._has_fan(device):
+            supported_features = supported_features | ClimateEntityFeature.FAN_MODE
 
         return supported_features
 
+    @staticmethod
+    def _has_fan(device: NeoDevice):
+        """Return true if the device can have a fan and reports one, not every HC thermostat has a fan attached."""
+        return (
+            DeviceCapability.FAN in device.capabilities
+            and device.fan_control is not None
+            and device.fan_speed is not None
+        )
+
+    @property
+    def fan_mode(self):
+        """Return the fan mode of an HC thermostat, None while a manually controlled fan is off."""
+        if self.data.fan_control == "Automatic":
+            return FAN_AUTO
+        return {
+            "Low": FAN_LOW,
+            "Medium": FAN_MEDIUM,
+            "High": FAN_HIGH,
+        }.get(self.data.fan_speed)
+
+    @property
+    def fan_modes(self):
+        """Return the fan modes of an HC thermostat."""
+        if self._has_fan(self.data or self._neostat):
+            return FAN_MODES
+        return None
+
     @property
     def target_temperature(self):
         """Return the temperature we try to reach."""
-        return float(self.data.target_temperature)
+        if self.hvac_mode == HVACMode.COOL:
+            return self.data.cool_temp
+        return self.data.target_temperature
 
     @property
     def target_temperature_high(self):
         """Return the temperature we try to reach."""
-        return float(self.data.cool_temp)
+        return self.data.cool_temp
 
     @property
     def target_temperature_low(self):
         """Return the temperature we try to reach."""
-        return float(self.data.target_temperature)
+        return self.data.target_temperature
 
     @property
     def target_temperature_step(self):
@@ -410,12 +463,6 @@ class NeoStatEntity(CoordinatorEntity, ClimateEntity):
             return UnitOfTemperature.FAHRENHEIT
         return self._unit_of_measurement
 
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neostat"
-
     async def unset_hold(self):
         """
         Unsets Hold for Zone
@@ -428,9 +475,8 @@ class NeoStatEntity(CoordinatorEntity, ClimateEntity):
 
         # Optimistically update the mode so that the UI feels snappy.
         # The value will be confirmed next time we get new data.
-        self.data.hold_on = False
-        self.data.hold_time = str("0:00")
-        self.data.hold_temp = 20
-        self.async_schedule_update_ha_state(False)
+        self._coordinator.async_patch_device(
+            self.data.device_id, hold_on=False, hold_time=timedelta(0), hold_temp=20.0
+        )
 
         return result
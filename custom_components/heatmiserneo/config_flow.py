@@ -2,7 +2,7 @@
 
 """Config flow for Heatmiser Neo."""
 
-import socket
+import asyncio
 import voluptuous as vol
 
 from copy import deepcopy
@@ -17,6 +17,7 @@ import homeassistant.helpers.config_validation as cv
 import logging
 
 from homeassistant.const import (
+    CONF_API_TOKEN,
     CONF_HOST,
     CONF_PORT
 )
@@ -26,24 +27,29 @@ from homeassistant.components.climate import HVACMode
 from .const import (
     DEFAULT_HOST,
     DEFAULT_PORT,
+    DEFAULT_TOKEN,
+    DEFAULT_WEBSOCKET_PORT,
     DOMAIN,
     CONF_HVAC_MODES,
-    AvailableMode
+    CONF_SCAN_INTERVAL_MAX,
+    CONF_SCAN_INTERVAL_MIN,
+    HVAC_MODES_BY_AVAILABLE_MODE,
 )
+from .coordinator import default_scan_interval_bounds
+from .hub import HeatmiserNeoHub
+from neohubapi.neohub import NeoHubConnectionError
 
 from homeassistant.core import callback
 from homeassistant.helpers.typing import DiscoveryInfoType
 
 _LOGGER = logging.getLogger(__name__)
 
-modes = {
-    AvailableMode.AUTO: HVACMode.HEAT_COOL,
-    AvailableMode.COOL: HVACMode.COOL,   
-    AvailableMode.HEAT: HVACMode.HEAT,
-    AvailableMode.VENT: HVACMode.FAN_ONLY
-}
+modes = HVAC_MODES_BY_AVAILABLE_MODE
 default_modes = [HVACMode.HEAT]
 
+# Seconds to wait for the hub to answer when testing the connection.
+CONNECTION_TIMEOUT = 5
+
 @config_entries.HANDLERS.register("heatmiserneo")
 class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow."""
@@ -55,6 +61,7 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize Heatmiser Neo options flow."""
         self._host = DEFAULT_HOST
         self._port = DEFAULT_PORT
+        self._token = DEFAULT_TOKEN
         self._errors = None
 
     async def async_step_zeroconf(self, discovery_info: DiscoveryInfoType):
@@ -83,15 +90,28 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
     async def try_connection(self):
+        """Check that a NeoHub answers on the host and port, without blocking the event loop."""
         _LOGGER.debug("Trying connection...")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
         try:
-            sock.connect((self._host, self._port))
-        except OSError:
+            hub = HeatmiserNeoHub(self._host, self._port, request_timeout=CONNECTION_TIMEOUT, token=self._token or None)
+        except NeoHubConnectionError as err:
+            _LOGGER.debug(f"Invalid connection settings: {err}")
+            return "cannot_connect"
+
+        # Ask the hub for its system data rather than just opening a socket, so we know it speaks the NeoHub API.
+        try:
+            async with asyncio.timeout(CONNECTION_TIMEOUT):
+                system_data = await hub.get_system()
+        except (asyncio.TimeoutError, OSError, NeoHubConnectionError) as err:
+            _LOGGER.debug(f"Connection failed: {err}")
             return "cannot_connect"
-        sock.close()
-        _LOGGER.debug("Connection Worked!")
+        except Exception:
+            _LOGGER.exception("Unexpected error while testing the connection")
+            return "unknown"
+        finally:
+            await hub.async_close()
+
+        _LOGGER.debug(f"Connection Worked! Hub version: {getattr(system_data, 'HUB_VERSION', None)}")
         return None
 
     @callback
@@ -100,7 +120,8 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             title=f"{self._host}:{self._port}", 
             data={
                 CONF_HOST: self._host,
-                CONF_PORT: self._port
+                CONF_PORT: self._port,
+                CONF_API_TOKEN: self._token
             }
         )
     async def async_step_user(self, user_input=None):
@@ -111,6 +132,15 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             self._host = user_input[CONF_HOST]
             self._port = user_input[CONF_PORT]
+            self._token = user_input.get(CONF_API_TOKEN, DEFAULT_TOKEN).strip()
+
+            # Token authentication is only available over the WebSocket API, and the legacy API takes no token.
+            if self._token and self._port == DEFAULT_PORT:
+                _LOGGER.debug(f"API token supplied, using WebSocket port {DEFAULT_WEBSOCKET_PORT}")
+                self._port = DEFAULT_WEBSOCKET_PORT
+            elif not self._token and self._port == DEFAULT_WEBSOCKET_PORT:
+                _LOGGER.debug(f"No API token supplied, using legacy port {DEFAULT_PORT}")
+                self._port = DEFAULT_PORT
 
             await self.async_set_unique_id(f"{self._host}:{self._port}")
             self._abort_if_unique_id_configured()
@@ -126,10 +156,11 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             data_schema=vol.Schema(
                 {
                     vol.Required(CONF_HOST, default=self._host): str,
-                    vol.Required(CONF_PORT, default=self._port): int
+                    vol.Required(CONF_PORT, default=self._port): int,
+                    vol.Optional(CONF_API_TOKEN, default=self._token): str
                 }
             ), 
-            errors=self._errors
+            errors={"base": self._errors} if self._errors else None
         )
 
     @staticmethod
@@ -147,6 +178,10 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input: Dict[str, str] = None) -> Dict[str, str]:
         """Manage the options for the custom component."""
+        return self.async_show_menu(step_id="init", menu_options=["hvac_modes", "polling"])
+
+    async def async_step_hvac_modes(self, user_input: Dict[str, str] = None) -> Dict[str, str]:
+        """Manage the HVAC modes of the climate entities."""
         errors: Dict[str, str] = {}
         
         # Grab all devices from the entity registry so we can populate the
@@ -181,12 +216,12 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 # If user selected the 'more' tickbox, show this form again 
                 # so they can configure additional devices.
                 if user_input.get('more', False):
-                    return await self.async_step_init()
+                    return await self.async_step_hvac_modes()
                     
                 # Value of data will be set on the options property of the config_entry instance.
                 return self.async_create_entry(
                     title="",
-                    data={CONF_HVAC_MODES: self.config}
+                    data={**self.config_entry.options, CONF_HVAC_MODES: self.config}
                 )
             
         options_schema = vol.Schema(
@@ -198,5 +233,37 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         )
 
         return self.async_show_form(
-            step_id="init", data_schema=options_schema, errors=errors
+            step_id="hvac_modes", data_schema=options_schema, errors=errors
+        )
+
+    async def async_step_polling(self, user_input: Dict[str, int] = None) -> Dict[str, str]:
+        """Manage the bounds of the adaptive polling interval."""
+        errors: Dict[str, str] = {}
+
+        if user_input is not None:
+            _LOGGER.debug(f"user_input: {user_input}")
+            if user_input[CONF_SCAN_INTERVAL_MIN] > user_input[CONF_SCAN_INTERVAL_MAX]:
+                errors["base"] = "invalid_scan_interval"
+            else:
+                return self.async_create_entry(
+                    title="",
+                    data={**self.config_entry.options, **user_input}
+                )
+
+        minimum, maximum = default_scan_interval_bounds(bool(self.config_entry.data.get(CONF_API_TOKEN)))
+        options_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_SCAN_INTERVAL_MIN,
+                    default=self.config_entry.options.get(CONF_SCAN_INTERVAL_MIN, minimum)
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Required(
+                    CONF_SCAN_INTERVAL_MAX,
+                    default=self.config_entry.options.get(CONF_SCAN_INTERVAL_MAX, maximum)
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            }
+        )
+
+        return self.async_show_form(
+            step_id="polling", data_schema=options_schema, errors=errors
         )
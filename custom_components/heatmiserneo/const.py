@@ -2,17 +2,58 @@
 
 import enum
 
+from homeassistant.components.climate import HVACMode
+
 """Constants used by multiple Heatmiser Neo modules."""
 DOMAIN = "heatmiserneo"
 
 HUB = "Hub"
 COORDINATOR = "Coordinator"
+HUB_MANAGER = "HubManager"
+SNAPSHOT_STORES = "SnapshotStores"
 
 DEFAULT_HOST = "Neo-Hub"
 DEFAULT_PORT = 4242
+DEFAULT_WEBSOCKET_PORT = 4243
 DEFAULT_TOKEN = ""
 
+# Bounds, in seconds, for the time between refreshes. The hub is polled at the minimum interval for a while after a
+# command or a change in heat demand, then backs off towards the maximum while the house is quiet.
+# The legacy API opens a new socket for every request, the token based WebSocket API keeps a single connection open,
+# so it is cheap enough to ask the hub much more often. The hub can't push changes, so the WebSocket API's maximum is
+# kept short for changes made on the thermostats or in the app to show up promptly.
+DEFAULT_SCAN_INTERVAL_MIN = 10
+DEFAULT_SCAN_INTERVAL_MAX = 120
+DEFAULT_WEBSOCKET_SCAN_INTERVAL_MIN = 2
+DEFAULT_WEBSOCKET_SCAN_INTERVAL_MAX = 10
+# Seconds between attempts to reach a hub that isn't answering double up to this, or the maximum interval if longer.
+FAILED_REFRESH_INTERVAL_MAX = 60
+# Seconds to keep polling at the minimum interval after activity.
+ACTIVITY_WINDOW = 120
+# Seconds to wait after a refresh is requested, so a burst of requests is handled by a single refresh.
+REFRESH_SETTLE_WINDOW = 2
+
+# Attempts at enabling NTP on the hub, and the seconds between them.
+NTP_RETRY_ATTEMPTS = 10
+NTP_RETRY_INTERVAL = 60
+
+# Version of the stored snapshot of the hub data, and the seconds between saving it.
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 300
+
+# Seconds to wait for commands for other zones while a command of the same kind is on its way to the hub, so they can
+# be sent as a single message.
+DEFAULT_COMMAND_BATCH_WINDOW = 0.05
+
+# Most connections the legacy API is allowed to have open to the hub at once, further requests wait their turn.
+# The WebSocket API always uses its single connection, one request at a time.
+DEFAULT_MAX_CONNECTIONS = 2
+# Most requests in flight across all of the hubs at once.
+DEFAULT_MAX_IN_FLIGHT_REQUESTS = 4
+
 CONF_HVAC_MODES = "hvac_modes"
+CONF_SCAN_INTERVAL_MIN = "scan_interval_min"
+CONF_SCAN_INTERVAL_MAX = "scan_interval_max"
 
 SERVICE_HOLD_ON = "hold_on"
 SERVICE_HOLD_OFF = "hold_off"
@@ -26,9 +67,61 @@ HEATMISER_PRODUCT_LIST = ["NULL", "NeoStat V1", "SmartStat", "CoolSwitch", "TCM
                           "NeoAir", "SmartStat HC", "NeoAir HW", "Repeater", "NeoStat HC", "NeoStat V2", "NeoAir V2",
                           "Air Sensor", "NeoAir V2 Combo", "RF Switch Wifi", "Edge WiFi"]
 
+
+class DeviceCapability(enum.IntFlag):
+    """What a type of device can do, so the platforms can test for a feature rather than list device types."""
+
+    HEAT = enum.auto()
+    COOL = enum.auto()
+    FAN = enum.auto()
+    # Can be switched to act as a time clock rather than a thermostat.
+    TIMECLOCK = enum.auto()
+    HOLD = enum.auto()
+    BATTERY = enum.auto()
+    PLUG = enum.auto()
+    CONTACT_SENSOR = enum.auto()
+    TEMPERATURE_SENSOR = enum.auto()
+
+
+_THERMOSTAT = DeviceCapability.HEAT | DeviceCapability.HOLD
+_HEAT_COOL_THERMOSTAT = _THERMOSTAT | DeviceCapability.COOL | DeviceCapability.FAN
+
+# Capabilities by DEVICE_TYPE, the index into HEATMISER_PRODUCT_LIST. Types that aren't listed can't do anything the
+# integration has entities for.
+DEVICE_CAPABILITIES = {
+    1: _THERMOSTAT | DeviceCapability.TIMECLOCK,  # NeoStat V1
+    2: _THERMOSTAT | DeviceCapability.TIMECLOCK | DeviceCapability.BATTERY,  # SmartStat
+    5: DeviceCapability.CONTACT_SENSOR | DeviceCapability.BATTERY,  # Contact Sensor
+    6: DeviceCapability.PLUG | DeviceCapability.HOLD,  # Neo Plug
+    7: _THERMOSTAT | DeviceCapability.TIMECLOCK,  # NeoAir
+    8: _HEAT_COOL_THERMOSTAT,  # SmartStat HC
+    9: _THERMOSTAT,  # NeoAir HW
+    11: _HEAT_COOL_THERMOSTAT,  # NeoStat HC
+    12: _THERMOSTAT | DeviceCapability.TIMECLOCK,  # NeoStat V2
+    13: _THERMOSTAT | DeviceCapability.TIMECLOCK | DeviceCapability.BATTERY,  # NeoAir V2
+    14: DeviceCapability.TEMPERATURE_SENSOR | DeviceCapability.BATTERY,  # Air Sensor
+    15: _THERMOSTAT,  # NeoAir V2 Combo
+    17: _THERMOSTAT,  # Edge WiFi
+}
+
+
+def device_capabilities(device_type) -> DeviceCapability:
+    """Return the capabilities of a type of device, none for types that aren't known."""
+    return DEVICE_CAPABILITIES.get(device_type, DeviceCapability(0))
+
+
 # This should be in the neohubapi.neohub enums code
 class AvailableMode(str, enum.Enum):
     HEAT = "heat"
     COOL = "cool"
     VENT = "vent"
     AUTO = "auto"
+
+
+# The HVAC modes for the hub's modes, used by the climate entities and in the integration's options.
+HVAC_MODES_BY_AVAILABLE_MODE = {
+    AvailableMode.AUTO: HVACMode.HEAT_COOL,
+    AvailableMode.COOL: HVACMode.COOL,
+    AvailableMode.HEAT: HVACMode.HEAT,
+    AvailableMode.VENT: HVACMode.FAN_ONLY,
+}
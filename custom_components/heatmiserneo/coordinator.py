@@ -0,0 +1,562 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""
+Data update coordinator for the Heatmiser NeoHub.
+
+Fetches the live data from the hub on every refresh, and only re-fetches the system, engineers and serial number
+data, and the heating profiles, when the hub reports that they have changed. The time between refreshes adapts to how
+much is going on, and requests for a refresh that arrive together are handled by a single refresh.
+
+A snapshot of the hub data is kept in Home Assistant's storage, so the entities can be set up from it straight away
+after a restart, even when the hub can't be reached.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+from enum import Enum
+from types import MappingProxyType, SimpleNamespace
+
+from homeassistant.core import callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from neohubapi.neohub import NeoHubConnectionError
+
+from .const import (
+    ACTIVITY_WINDOW,
+    CONF_SCAN_INTERVAL_MAX,
+    CONF_SCAN_INTERVAL_MIN,
+    DEFAULT_SCAN_INTERVAL_MAX,
+    DEFAULT_SCAN_INTERVAL_MIN,
+    DEFAULT_WEBSOCKET_SCAN_INTERVAL_MAX,
+    DEFAULT_WEBSOCKET_SCAN_INTERVAL_MIN,
+    DOMAIN,
+    FAILED_REFRESH_INTERVAL_MAX,
+    REFRESH_SETTLE_WINDOW,
+    SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_STORAGE_VERSION,
+    SNAPSHOT_STORES,
+)
+from .models import NeoDevice
+from .profiles import HeatmiserNeoProfiles
+
+_LOGGER = logging.getLogger(__name__)
+
+# Change markers reported by GET_LIVE_DATA, and the sections of the hub data they cover.
+TIMESTAMP_SYSTEM = "TIMESTAMP_SYSTEM"
+TIMESTAMP_ENGINEERS = "TIMESTAMP_ENGINEERS"
+TIMESTAMP_DEVICE_LISTS = "TIMESTAMP_DEVICE_LISTS"
+
+# Seconds either side of a hub's poll slot that count as being in it.
+POLL_SLOT_TOLERANCE = 1
+
+def snapshot_store(hass, entry_id):
+    """Return the storage for a hub's snapshot, always the same one for an entry so that it can be removed cleanly."""
+    stores = hass.data[DOMAIN].setdefault(SNAPSHOT_STORES, {})
+    if entry_id not in stores:
+        stores[entry_id] = Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot")
+    return stores[entry_id]
+
+
+async def async_remove_snapshot(hass, entry_id):
+    """Remove a hub's snapshot, along with any write of it that is still pending."""
+    store = snapshot_store(hass, entry_id)
+    del hass.data[DOMAIN][SNAPSHOT_STORES][entry_id]
+    await store.async_remove()
+
+
+def default_scan_interval_bounds(uses_websocket):
+    """Return the default (minimum, maximum) seconds between refreshes for the API used to reach the hub."""
+    if uses_websocket:
+        return DEFAULT_WEBSOCKET_SCAN_INTERVAL_MIN, DEFAULT_WEBSOCKET_SCAN_INTERVAL_MAX
+    return DEFAULT_SCAN_INTERVAL_MIN, DEFAULT_SCAN_INTERVAL_MAX
+
+
+class HeatmiserNeoCoordinator(DataUpdateCoordinator):
+    """Fetches data from a NeoHub and makes it available to all of the entities."""
+
+    def __init__(self, hass, entry, hub, host):
+        self._entry = entry
+        self._hub = hub
+        # The time between refreshes, before the wait for the next one is adjusted to this hub's slot.
+        self._scan_interval = self.scan_interval_bounds[0]
+
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"Heatmiser NeoHub : {host}",
+            update_interval=timedelta(seconds=self._scan_interval),
+            # Wait for the requests to settle, rather than refreshing straight away and again after the cooldown.
+            request_refresh_debouncer=Debouncer(hass, _LOGGER, cooldown=REFRESH_SETTLE_WINDOW, immediate=False),
+            always_update=True
+        )
+
+        self._system_data = None
+        self._engineers_data = None
+        self._serial_numbers = None
+        self._device_ids = None
+        self._timestamps = {}
+        self.profiles = HeatmiserNeoProfiles(hub)
+        self._profiles_task = None
+        # The hub's device data, with the engineers data merged in, as saved in the snapshot.
+        self._live_devices = None
+        self._snapshot_store = snapshot_store(hass, entry.entry_id)
+        # The snapshot is saved after a refresh at most every SNAPSHOT_SAVE_DELAY seconds, and when the hub is unloaded.
+        self._snapshot_unsaved = False
+        self._next_snapshot_save = 0
+        # True while the data comes from the snapshot rather than the hub.
+        self.restored = False
+        # Statistics for the last refresh, reported through diagnostics.
+        self.refresh_stats = {}
+        # Refreshes asked for by entities and commands, against the refreshes that actually ran because of them.
+        self.refresh_requests = {"requested": 0, "executed": 0, "skipped_confirmed": 0}
+
+        # Start up counts as activity, so the first few minutes are polled quickly.
+        self._active_until = time.monotonic() + ACTIVITY_WINDOW
+        self._heat_demand = None
+        # IDs of the devices that changed in the last refresh, None updates every listener.
+        self._changed_device_ids = None
+        # Fraction of the interval this hub's polls are offset by, set by the hub manager.
+        self.poll_phase = 0
+        self._remove_command_listener = hub.add_command_listener(self.async_command_sent)
+        self._system_listeners = []
+        # Count only the refreshes the debouncer runs for requests, not the scheduled or first ones.
+        self._debounced_refresh.function = self._async_requested_refresh
+
+    @property
+    def scan_interval_bounds(self):
+        """Return the configured (minimum, maximum) seconds between refreshes."""
+        minimum, maximum = default_scan_interval_bounds(self._hub.uses_websocket)
+        minimum = self._entry.options.get(CONF_SCAN_INTERVAL_MIN, minimum)
+        maximum = self._entry.options.get(CONF_SCAN_INTERVAL_MAX, maximum)
+        return minimum, max(minimum, maximum)
+
+    def add_system_listener(self, listener):
+        """
+        Call listener whenever the system data is fetched from the hub, returns a function that removes the listener.
+
+        The listener is passed the system data. It isn't called for the system data restored from the snapshot.
+        """
+        self._system_listeners.append(listener)
+
+        def remove_listener():
+            if listener in self._system_listeners:
+                self._system_listeners.remove(listener)
+
+        return remove_listener
+
+    async def async_restore_snapshot(self):
+        """Use the last snapshot of the hub data until the hub answers, returns true if there was one."""
+        snapshot = await self._snapshot_store.async_load()
+        if not snapshot:
+            return False
+
+        # Stored as plain JSON, turn it back into namespaces as neohubapi would.
+        snapshot = json.loads(json.dumps(snapshot), object_hook=lambda value: SimpleNamespace(**value))
+        self._serial_numbers = dict(snapshot.serial_numbers)
+        self._live_devices = snapshot.devices
+        self._system_data = snapshot.system
+
+        self.data = (self._neo_devices_data(self._live_devices), self._system_data)
+        # The data is stale, so let the entities know that the hub hasn't been heard from yet.
+        self.last_update_success = False
+        self.restored = True
+        _LOGGER.info(f"{self.name} : Restored {len(self._live_devices)} devices from the snapshot")
+        return True
+
+    def _snapshot_data(self):
+        """Return the snapshot of the hub data to store."""
+        return {
+            "system": self._to_json(self._system_data),
+            "devices": self._to_json(self._live_devices),
+            # JSON object keys are always strings, so keep the integer device IDs in pairs.
+            "serial_numbers": list(self._serial_numbers.items()),
+        }
+
+    @staticmethod
+    def _to_json(value):
+        """Turn namespaces from neohubapi into plain JSON, enums such as the system data's FORMAT are kept as values."""
+        return json.loads(json.dumps(value, default=lambda item: item.value if isinstance(item, Enum) else vars(item)))
+
+    @callback
+    def async_patch_device(self, device_id, **changes):
+        """Optimistically change a device's data until the next refresh, and update the device's entities."""
+        devices_data, system_data = self.data
+        device = devices_data['neo_devices_by_id'][device_id].replace(**changes)
+        neo_devices = [
+            device if neo_device.device_id == device_id else neo_device for neo_device in devices_data['neo_devices']
+        ]
+        self.data = (self._index_devices(neo_devices), system_data)
+
+        self._changed_device_ids = {device_id}
+        self.async_update_listeners()
+        return device
+
+    def next_scheduled_change(self, device):
+        """Return the next change in a thermostat's heating profile, see HeatmiserNeoProfiles.next_change()."""
+        # The format is an enum when fetched from the hub, and its value when restored from the snapshot.
+        schedule_format = getattr(self._system_data, 'FORMAT', None)
+        return self.profiles.next_change(device, getattr(schedule_format, 'value', schedule_format), dt_util.now())
+
+    @callback
+    def async_command_sent(self, confirmed):
+        """Handle a command sent to the hub, refreshing only if the hub didn't confirm it."""
+        self.async_note_activity()
+        if confirmed:
+            # The entities have already shown the change, the next poll picks up anything else it caused.
+            self.refresh_requests["skipped_confirmed"] += 1
+        else:
+            self.hass.async_create_task(self.async_request_refresh())
+
+    async def async_request_refresh(self):
+        """Request a refresh, requests made within the settle window share one refresh."""
+        self.refresh_requests["requested"] += 1
+        await super().async_request_refresh()
+
+    async def _async_requested_refresh(self):
+        """Refresh for the requests the debouncer has collected."""
+        self.refresh_requests["executed"] += 1
+        await self.async_refresh()
+
+    @callback
+    def async_apply_options(self):
+        """Apply changed options without setting the hub up again."""
+        minimum, maximum = self.scan_interval_bounds
+        self._set_scan_interval(min(maximum, max(minimum, self._scan_interval)))
+        if self._listeners:
+            self._schedule_refresh()
+
+        # The climate entities read their HVAC modes from the options, so update all of them.
+        self._changed_device_ids = None
+        self.async_update_listeners()
+
+    @callback
+    def async_note_activity(self):
+        """Poll at the minimum interval for a while, called when something has changed."""
+        self._active_until = time.monotonic() + ACTIVITY_WINDOW
+
+        minimum, _ = self.scan_interval_bounds
+        if self._scan_interval > minimum:
+            self._set_scan_interval(minimum)
+            # Bring the next refresh forward rather than waiting for the long interval to run out.
+            if self._listeners:
+                self._schedule_refresh()
+
+    def _set_scan_interval(self, seconds):
+        """Set the time between refreshes, see _schedule_refresh() for how they line up with this hub's slot."""
+        self._scan_interval = seconds
+        self.update_interval = timedelta(seconds=seconds)
+
+    @callback
+    def _schedule_refresh(self):
+        """
+        Schedule the next refresh, shortening the wait so it lands in this hub's slot of the interval.
+
+        Hubs polling at the same interval then take turns. Once in its slot every interval after it is a whole one. Only
+        the scheduled wait is shortened, update_interval stays the whole interval.
+        """
+        if self._update_interval_seconds is None:
+            return
+
+        self._update_interval_seconds = self._delay_to_slot()
+        try:
+            super()._schedule_refresh()
+        finally:
+            self._update_interval_seconds = self._scan_interval
+
+    def _delay_to_slot(self):
+        """Return the seconds from now until this hub's next slot of the interval."""
+        seconds = self._scan_interval
+        now = self.hass.loop.time()
+        next_refresh = now + seconds
+        next_refresh -= (next_refresh - self.poll_phase * seconds) % seconds
+        delay = next_refresh - now
+        # Home Assistant schedules refreshes from the time rounded down to the second, so a refresh can run up to a
+        # second before its slot. A slot that close is the one just polled in, wait for the next.
+        if delay < POLL_SLOT_TOLERANCE:
+            delay += seconds
+        return delay
+
+    @callback
+    def async_update_listeners(self):
+        """Update the listeners of the devices that changed, and any listener that isn't tied to a device."""
+        changed_device_ids = self._changed_device_ids
+        self._changed_device_ids = None
+
+        for update_callback, device_id in list(self._listeners.values()):
+            if changed_device_ids is None or device_id is None or device_id in changed_device_ids:
+                update_callback()
+
+    def _find_changed_device_ids(self, neo_devices):
+        """Return the IDs of the devices whose data differs from what the entities were last given."""
+        if self.data is None or not self.last_update_success:
+            # Nothing to compare against, or recovering from an error, so update everything.
+            return None
+
+        (previous_devices, _) = self.data
+        previous_devices_by_id = previous_devices['neo_devices_by_id']
+
+        changed_device_ids = set()
+        for device in neo_devices:
+            # The previous devices include any optimistic changes the entities made, so a command that didn't take
+            # effect on the hub is still written back.
+            previous_device = previous_devices_by_id.get(device.device_id)
+            if previous_device != device:
+                changed_device_ids.add(device.device_id)
+        return changed_device_ids
+
+    def _log_invalid_readings(self, neo_devices):
+        """Log readings that have gone out of range since the last refresh, rather than on every state update."""
+        previous_devices_by_id = self.data[0]['neo_devices_by_id'] if self.data is not None else {}
+        for device in neo_devices:
+            previous_device = previous_devices_by_id.get(device.device_id)
+            if device.invalid_readings and (
+                previous_device is None or previous_device.invalid_readings != device.invalid_readings
+            ):
+                _LOGGER.error(
+                    f"Device '{device.name}' has invalid {', '.join(device.invalid_readings)} readings, "
+                    f"Hub lost connection?"
+                )
+
+    async def async_shutdown(self):
+        """Stop refreshing and stop listening for commands, saving the latest snapshot."""
+        await super().async_shutdown()
+        self._remove_command_listener()
+        await self.async_save_snapshot()
+
+    async def async_save_snapshot(self):
+        """Save a snapshot of the hub data, if there has been a refresh since the last one was saved."""
+        if not self._snapshot_unsaved:
+            return
+        self._snapshot_unsaved = False
+        self._next_snapshot_save = time.monotonic() + SNAPSHOT_SAVE_DELAY
+        await self._snapshot_store.async_save(self._snapshot_data())
+
+    def _update_scan_interval(self, neo_devices):
+        """Poll quickly while things are changing, backing off while the house is quiet."""
+        heat_demand = frozenset(device.device_id for device in neo_devices if device.heat_on or device.cool_on)
+        if self._heat_demand is not None and heat_demand != self._heat_demand:
+            self._active_until = time.monotonic() + ACTIVITY_WINDOW
+        self._heat_demand = heat_demand
+
+        minimum, maximum = self.scan_interval_bounds
+        if time.monotonic() < self._active_until:
+            seconds = minimum
+        else:
+            # Double the interval on every quiet refresh until it reaches the maximum.
+            seconds = min(maximum, max(minimum, self._scan_interval * 2))
+        self._set_scan_interval(seconds)
+
+    def _back_off(self):
+        """Wait longer before each attempt to reach a hub that isn't answering."""
+        minimum, maximum = self.scan_interval_bounds
+        self._set_scan_interval(
+            min(max(maximum, FAILED_REFRESH_INTERVAL_MAX), max(minimum, self._scan_interval * 2))
+        )
+
+    def _is_stale(self, live_data, marker):
+        """Return true if the cached section behind a change marker needs to be fetched again."""
+        current = getattr(live_data, marker, None)
+        # Older firmware doesn't report change markers, so always fetch.
+        return current is None or self._timestamps.get(marker) != current
+
+    async def _async_update_data(self):
+        """Fetch data from the Hub all at once and make it available for all devices."""
+        _LOGGER.info("Executing update_data()")
+        bytes_before = self._hub.bytes_received
+        timings = {}
+
+        try:
+            live_data, live_device_ids, responses = await self._async_fetch(timings)
+        except (asyncio.TimeoutError, OSError, NeoHubConnectionError, ValueError) as err:
+            # Raised as UpdateFailed so that Home Assistant logs the hub going away once, rather than every attempt.
+            self._back_off()
+            raise UpdateFailed(f"Error communicating with the hub: {err!r}") from err
+
+        if "system" in responses:
+            self._system_data = responses["system"]
+            self._timestamps[TIMESTAMP_SYSTEM] = getattr(live_data, TIMESTAMP_SYSTEM, None)
+            for listener in list(self._system_listeners):
+                listener(self._system_data)
+        if "engineers" in responses:
+            self._engineers_data = self._index_engineers_data(responses["engineers"])
+            self._timestamps[TIMESTAMP_ENGINEERS] = getattr(live_data, TIMESTAMP_ENGINEERS, None)
+        if "serial_numbers" in responses:
+            _LOGGER.debug(f"device_serial_numbers: {responses['serial_numbers']}")
+            self._serial_numbers = self._index_serial_numbers(responses["serial_numbers"])
+            self._device_ids = live_device_ids
+            self._timestamps[TIMESTAMP_DEVICE_LISTS] = getattr(live_data, TIMESTAMP_DEVICE_LISTS, None)
+
+        parse_start = time.perf_counter()
+        devices_data = self._build_devices_data(live_data)
+        timings["parse"] = time.perf_counter() - parse_start
+
+        self._update_scan_interval(devices_data['neo_devices'])
+        self._log_invalid_readings(devices_data['neo_devices'])
+        self._changed_device_ids = self._find_changed_device_ids(devices_data['neo_devices'])
+        self._start_profiles_refresh(live_data)
+        self.restored = False
+        self._snapshot_unsaved = True
+        # Saved straight away the first time, so a power cut soon after start up doesn't leave an old snapshot.
+        if time.monotonic() >= self._next_snapshot_save:
+            await self.async_save_snapshot()
+
+        self.refresh_stats = {
+            "fetched": ["live_data", *responses],
+            # Only known for the legacy API, see HeatmiserNeoHub.
+            "bytes_received": None if bytes_before is None else self._hub.bytes_received - bytes_before,
+            "timings_ms": {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()},
+            "devices": len(devices_data['neo_devices']),
+            "changed_devices": (
+                len(devices_data['neo_devices']) if self._changed_device_ids is None else len(self._changed_device_ids)
+            ),
+            "invalid_readings": {
+                device.name: list(device.invalid_readings)
+                for device in devices_data['neo_devices'] if device.invalid_readings
+            },
+            "update_interval_s": self._scan_interval,
+        }
+        _LOGGER.debug(f"refresh_stats: {self.refresh_stats}")
+        _LOGGER.debug(f"system_data: {self._system_data}")
+        _LOGGER.debug(f"devices_data: {devices_data}")
+
+        return devices_data, self._system_data
+
+    async def _async_fetch(self, timings):
+        """Fetch the live data, and the sections of the hub data whose change markers have moved."""
+        async with asyncio.timeout(30):
+            # The live data has to come first, its change markers decide what else needs fetching.
+            live_data = await self._async_timed(timings, "live_data", self._hub.get_live_data)
+            live_device_ids = self._live_device_ids(live_data)
+
+            requests = {}
+            if self._system_data is None or self._is_stale(live_data, TIMESTAMP_SYSTEM):
+                requests["system"] = self._hub.get_system
+
+            if (
+                self._engineers_data is None
+                or self._is_stale(live_data, TIMESTAMP_ENGINEERS)
+                or not self._engineers_data.keys() >= live_device_ids
+            ):
+                # A device we have no engineers data for means the markers can't be trusted, so do a full fetch.
+                requests["engineers"] = self._hub.get_engineers
+
+            # Serial numbers only change when devices are added or removed.
+            if (
+                self._serial_numbers is None
+                or self._is_stale(live_data, TIMESTAMP_DEVICE_LISTS)
+                or self._device_ids != live_device_ids
+            ):
+                requests["serial_numbers"] = self._hub.devices_sn
+
+            # The hub client queues these, running them side by side where the API allows it.
+            results = await asyncio.gather(
+                *(self._async_timed(timings, stage, request) for stage, request in requests.items())
+            )
+
+        return live_data, live_device_ids, dict(zip(requests, results))
+
+    def _start_profiles_refresh(self, live_data):
+        """
+        Fetch the profiles in the background if they have changed, or a zone uses one that hasn't been fetched yet.
+
+        There can be a request per zone, so they are left out of the refresh rather than holding it up.
+        """
+        if self._profiles_task is not None and not self._profiles_task.done():
+            return
+
+        profiles_request = self.profiles.refresh_request(live_data)
+        if profiles_request is not None:
+            self._profiles_task = self._entry.async_create_background_task(
+                self.hass, self._async_refresh_profiles(profiles_request), f"{self.name} profiles"
+            )
+
+    async def _async_refresh_profiles(self, profiles_request):
+        """Fetch the profiles, then update every listener as a changed profile can move any zone's next change."""
+        start = time.perf_counter()
+        try:
+            await profiles_request()
+        except (asyncio.TimeoutError, OSError, NeoHubConnectionError, ValueError) as err:
+            # The markers are only recorded once fetched, so the next refresh tries again.
+            _LOGGER.warning(f"{self.name} : Could not fetch the heating profiles: {err}")
+            return
+
+        self.refresh_stats["profiles_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        self._changed_device_ids = None
+        self.async_update_listeners()
+
+    @staticmethod
+    async def _async_timed(timings, stage, request):
+        """Make a hub request, recording how long it took."""
+        start = time.perf_counter()
+        try:
+            return await request()
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    @staticmethod
+    def _live_device_ids(live_data):
+        """Return the IDs of the devices in the live data, repeaters have no ID and are ignored."""
+        return {
+            device.DEVICE_ID for device in live_data.devices if getattr(device, 'DEVICE_ID', None) is not None
+        }
+
+    @staticmethod
+    def _index_engineers_data(eng_hub_data):
+        """Index the engineers data by device ID."""
+        return {
+            engineers_data.DEVICE_ID: engineers_data
+            for engineers_data in vars(eng_hub_data).values()
+            if getattr(engineers_data, 'DEVICE_ID', None) is not None
+        }
+
+    @staticmethod
+    def _index_serial_numbers(device_serial_numbers):
+        """Map device IDs to serial numbers, DEVICES_SN replies are keyed by name as {'name': [id, 'serial', 1]}."""
+        serial_numbers = {}
+        for device_id, serial_number, *_ in vars(device_serial_numbers).values():
+            # Keep the first serial number reported for a device.
+            serial_numbers.setdefault(device_id, serial_number)
+        return serial_numbers
+
+    def _build_devices_data(self, live_data):
+        """Combine the live and engineers data into devices, as neohubapi's get_devices_data() does."""
+        live_devices = []
+
+        for device in live_data.devices:
+            device_id = getattr(device, 'DEVICE_ID', None)
+            if device_id is None:
+                _LOGGER.debug(f"Ignoring device '{device.device}', which has no ID and might be a repeater.")
+                continue
+
+            engineers_data = self._engineers_data.get(device_id)
+            if engineers_data is not None:
+                for key, value in vars(engineers_data).items():
+                    # Don't overwrite FLOOR_LIMIT, instead set ENG_FLOOR_LIMIT
+                    setattr(device, "ENG_FLOOR_LIMIT" if key == "FLOOR_LIMIT" else key, value)
+            live_devices.append(device)
+
+        self._live_devices = live_devices
+        return self._neo_devices_data(live_devices)
+
+    def _neo_devices_data(self, live_devices):
+        """Build the devices from the hub's device data."""
+        temperature_unit = getattr(self._system_data, 'CORF', None)
+        neo_devices = [
+            NeoDevice.from_hub_data(device, self._serial_numbers.get(device.DEVICE_ID, "UNKNOWN"), temperature_unit)
+            for device in live_devices
+        ]
+        return self._index_devices(neo_devices)
+
+    @staticmethod
+    def _index_devices(neo_devices):
+        """Build the lookup tables once per refresh so entities don't have to."""
+        return {
+            'neo_devices': neo_devices,
+            'neo_devices_by_id': MappingProxyType({device.device_id: device for device in neo_devices}),
+            'neo_devices_by_name': MappingProxyType({device.name: device for device in neo_devices}),
+        }
@@ -0,0 +1,26 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Diagnostics support for Heatmiser Neo."""
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_API_TOKEN
+
+from .const import COORDINATOR, DOMAIN, HUB, HUB_MANAGER
+
+TO_REDACT = {CONF_API_TOKEN}
+
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    """Return diagnostics for a config entry."""
+    hub = hass.data[DOMAIN][entry.entry_id][HUB]
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "hub": hub.stats,
+        "restored_from_snapshot": coordinator.restored,
+        "last_refresh": coordinator.refresh_stats,
+        "refresh_requests": coordinator.refresh_requests,
+        # Every hub, as they share the manager's request limit.
+        "all_hubs": hass.data[DOMAIN][HUB_MANAGER].stats,
+    }
@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""
+Base entity for the devices on a NeoHub.
+
+The unique ID and device info of an entity are worked out once, when it is created, rather than every time Home
+Assistant asks for them. The device info is only worked out again if the device's type or firmware changes.
+"""
+
+import logging
+
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN, HEATMISER_PRODUCT_LIST
+from .models import NeoDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HeatmiserNeoEntity(CoordinatorEntity):
+    """An entity of a device on a NeoHub, subclasses set the end of their unique ID in _unique_id_suffix."""
+
+    _unique_id_suffix: str
+
+    def __init__(self, neostat: NeoDevice, coordinator, hub=None):
+        super().__init__(coordinator, neostat.device_id)
+        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neostat.device_id} Name: {neostat.name}")
+
+        self._neostat = neostat
+        self._coordinator = coordinator
+        self._hub = hub
+
+        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
+        self._attr_unique_id = (
+            f"{neostat.name}_{coordinator.serial_number}_{neostat.serial_number}_{self._unique_id_suffix}"
+        )
+        self._device_info_key = (neostat.device_type, neostat.stat_version)
+        self._attr_device_info = self._build_device_info(neostat)
+
+    @property
+    def available(self):
+        """Return true if the device is online, and its data came from the hub rather than the stored snapshot."""
+        device = self.data
+        return device is not None and not self._coordinator.restored and not device.offline
+
+    @property
+    def data(self) -> NeoDevice | None:
+        """Helper to get the data for the current device, None if the hub no longer reports it."""
+        (devices, _) = self._coordinator.data
+        return devices['neo_devices_by_id'].get(self._neostat.device_id)
+
+    def _build_device_info(self, device: NeoDevice) -> DeviceInfo:
+        """Return the device info shared by all of the device's entities."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
+            manufacturer="Heatmiser",
+            model=f"{HEATMISER_PRODUCT_LIST[device.device_type]}",
+            name=self._neostat.name,
+            serial_number=self._neostat.serial_number,
+            suggested_area=self._neostat.name,
+            sw_version=device.stat_version,
+            via_device=(DOMAIN, self._coordinator.serial_number),
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update the device registry as well if the device's type or firmware has changed."""
+        device = self.data
+        device_info_key = None if device is None else (device.device_type, device.stat_version)
+        if device_info_key is not None and device_info_key != self._device_info_key:
+            self._device_info_key = device_info_key
+            self._attr_device_info = self._build_device_info(device)
+            if self.device_entry is not None:
+                dr.async_get(self.hass).async_update_device(
+                    self.device_entry.id,
+                    model=self._attr_device_info["model"],
+                    sw_version=self._attr_device_info["sw_version"],
+                )
+
+        super()._handle_coordinator_update()
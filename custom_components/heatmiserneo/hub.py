@@ -0,0 +1,341 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""
+Heatmiser NeoHub client used by the integration.
+
+Thin wrapper around neohubapi's NeoHub that keeps track of the traffic sent to the hub, and of commands so the
+coordinator can poll more often while things are changing. Commands for several zones that are sent at the same time
+are merged into a single message, as the hub accepts a list of zones for most commands.
+
+Requests are queued so that only a few connections are open to the hub at once. The legacy API needs a new connection
+for every request, the WebSocket API reuses one connection that can only handle a single request at a time. Hubs can
+also share a limit on the requests in flight across all of them, see HeatmiserNeoHubManager.
+"""
+
+import asyncio
+import collections
+import contextlib
+import json
+import logging
+import time
+
+from neohubapi.neohub import NeoHub, NeoHubConnectionError
+from websockets.exceptions import ConnectionClosed
+from websockets.protocol import State
+
+from .const import DEFAULT_COMMAND_BATCH_WINDOW, DEFAULT_MAX_CONNECTIONS
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commands whose last argument is a list of zone names, e.g. {"FROST_ON": ["Kitchen"]} or
+# {"SET_TEMP": [21, ["Kitchen"]]}. The same command with the same arguments can be sent for many zones at once.
+BATCHABLE_COMMANDS = {
+    "FROST_OFF",
+    "FROST_ON",
+    "HOLD",
+    "MANUAL_OFF",
+    "MANUAL_ON",
+    "SET_COOL_TEMP",
+    "SET_HC_MODE",
+    "SET_TEMP",
+    "TIMER_HOLD_OFF",
+    "TIMER_HOLD_ON",
+    "TIMER_OFF",
+    "TIMER_ON",
+}
+
+
+class _CommandBatch:
+    """Commands for several zones waiting to be merged into one message."""
+
+    def __init__(self, command, arguments, names):
+        self.command = command
+        self.arguments = arguments
+        self.names = list(names)
+        # Sends the merged message, the batch owns it so a caller giving up doesn't cancel the others' commands.
+        self.task = None
+
+    def add(self, names):
+        self.names.extend(name for name in names if name not in self.names)
+
+    @property
+    def message(self):
+        if self.arguments is None:
+            return {self.command: self.names}
+        return {self.command: [self.arguments, self.names]}
+
+
+class _WebSocketConnection:
+    """
+    A connection from websockets 14 or later, which neohubapi can use like the connections of earlier versions.
+
+    neohubapi checks the closed attribute of the connection before every request, the newer connections only have a
+    state.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    @property
+    def closed(self):
+        return self._connection.state is not State.OPEN
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class HeatmiserNeoHub(NeoHub):
+    """NeoHub client that queues requests, batches commands and keeps simple traffic statistics."""
+
+    def __init__(
+            self,
+            *args,
+            command_batch_window=DEFAULT_COMMAND_BATCH_WINDOW,
+            max_connections=DEFAULT_MAX_CONNECTIONS,
+            request_slots=None,
+            **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        # Only the legacy API exposes the raw reply, WebSocket replies are decoded inside neohubapi.
+        self.bytes_received = None if self.uses_websocket else 0
+        self._command_listeners = []
+        self._command_batch_window = command_batch_window
+        self._command_batches = {}
+        self._batch_tasks = set()
+        # Batchable commands that have been sent and not answered yet, by command.
+        self._commands_in_flight = collections.Counter()
+        # Replies on the WebSocket aren't matched to requests, so it can only be used by one request at a time.
+        self._connection_slots = asyncio.Semaphore(1 if self.uses_websocket else max_connections)
+        # Shared with other hubs, so the integration as a whole only has a few requests in flight.
+        self._request_slots = request_slots or contextlib.nullcontext()
+        self.stats = {
+            "requests": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "in_flight": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+            "completed": 0,
+            "last_latency_ms": None,
+            "average_latency_ms": None,
+            "max_latency_ms": None,
+        }
+
+    @property
+    def _websocket(self):
+        return self._websocket_connection
+
+    @_websocket.setter
+    def _websocket(self, connection):
+        if connection is not None and not hasattr(connection, 'closed'):
+            connection = _WebSocketConnection(connection)
+        self._websocket_connection = connection
+
+    @property
+    def uses_websocket(self):
+        """Return true if requests go over the token authenticated WebSocket API rather than the legacy API."""
+        return self._token is not None
+
+    def add_command_listener(self, listener):
+        """
+        Call listener whenever a command is sent to the hub, returns a function that removes the listener.
+
+        The listener is passed true if the hub confirmed the command.
+        """
+        self._command_listeners.append(listener)
+
+        def remove_listener():
+            if listener in self._command_listeners:
+                self._command_listeners.remove(listener)
+
+        return remove_listener
+
+    async def async_close(self):
+        """Close the WebSocket connection, if there is one open."""
+        websocket, self._websocket = self._websocket, None
+        if websocket is not None:
+            await websocket.close()
+
+    async def get_profiles(self):
+        """Get the heating profiles stored on the hub."""
+        message = {"GET_PROFILES": 0}
+
+        return await self._send(message)
+
+    async def get_profile_0(self, zone):
+        """Get the heating levels of a zone that doesn't use one of the stored profiles."""
+        message = {"GET_PROFILE_0": zone}
+
+        return await self._send(message)
+
+    async def identify_device(self, device):
+        """Flash the LED of a device."""
+        message = {"IDENTIFY_DEV": device.name}
+        reply = {"result": "Device identifying"}
+
+        return await self._send(message, reply)
+
+    async def set_fan_speed(self, fan_speed: str, devices):
+        """
+        Set the fan speed of HC thermostats to AUTO, HIGH, MEDIUM or LOW, returns False if the hub reported an error.
+
+        The wording of the hub's reply isn't documented, so unlike the other commands it can't be checked, or merged
+        with the same command for other zones. The listeners are told it wasn't confirmed, so the coordinator refreshes
+        to see whether it took effect.
+        """
+        message = {"SET_FAN_SPEED": [fan_speed, self._devices_to_names(devices)]}
+
+        reply = await self._send(message)
+        _LOGGER.debug(f"Reply: {reply} for message: {message}")
+        self._notify_command_listeners(False)
+        return not hasattr(reply, 'error')
+
+    async def set_plug_power(self, state: bool, devices):
+        """
+        Switch the output of NeoPlugs on or off, only sending the commands each plug needs.
+
+        Any hold is cleared and, when switching on, the timeclock reinstated before the output is switched. Plugs
+        switched at the same time share messages. Returns True if the hub confirmed every command.
+        """
+        held = [device for device in devices if device.hold_on]
+        timeclock_off = [device for device in devices if state and not device.manual_off]
+        switch = [
+            device for device in devices
+            if device.hold_on or (state and not device.manual_off) or device.timer_on != state
+        ]
+
+        if held:
+            # Holding for 0 minutes and then releasing the hold clears whatever hold the plug had.
+            if not await self.set_timer_hold(True, 0, held):
+                return False
+
+        commands = []
+        if held:
+            commands.append(self.set_timer_hold(False, 0, held))
+        if timeclock_off:
+            commands.append(self.set_manual(False, timeclock_off))
+        if commands and not all(await asyncio.gather(*commands)):
+            return False
+
+        if switch:
+            return await self.set_timer(state, switch)
+        return True
+
+    @staticmethod
+    def _split_batchable(message):
+        """Return (command, arguments, names) for a command that can be batched, or None."""
+        if not isinstance(message, dict) or len(message) != 1:
+            return None
+
+        ((command, value),) = message.items()
+        if command not in BATCHABLE_COMMANDS or not isinstance(value, list):
+            return None
+
+        if all(isinstance(name, str) for name in value):
+            return command, None, value
+        if len(value) == 2 and isinstance(value[1], list) and all(isinstance(name, str) for name in value[1]):
+            return command, value[0], value[1]
+        return None
+
+    async def _send(self, message, expected_reply=None):
+        """Send a message to the hub, merging commands for different zones that are sent together."""
+        batchable = self._split_batchable(message) if expected_reply is not None else None
+        if batchable is None:
+            return await self._send_now(message, expected_reply)
+
+        command, arguments, names = batchable
+        batch_arguments = arguments
+        if command == "HOLD" and isinstance(arguments, dict):
+            # The id only labels the hold, so holds that differ only by id can be merged.
+            batch_arguments = {key: value for key, value in arguments.items() if key != "id"}
+        batch_key = (command, json.dumps(batch_arguments, sort_keys=True), json.dumps(expected_reply, sort_keys=True))
+
+        batch = self._command_batches.get(batch_key)
+        if batch is not None:
+            # Another zone already started this batch and it hasn't been sent yet.
+            batch.add(names)
+        else:
+            batch = self._command_batches[batch_key] = _CommandBatch(command, arguments, names)
+            batch.task = asyncio.create_task(self._async_send_batch(batch_key, batch, expected_reply))
+            self._batch_tasks.add(batch.task)
+            batch.task.add_done_callback(self._batch_tasks.discard)
+
+        # Shielded, so that a caller that is cancelled only stops waiting.
+        return await asyncio.shield(batch.task)
+
+    async def _async_send_batch(self, batch_key, batch, expected_reply):
+        """Send a batch of commands, after giving commands for other zones a chance to join it."""
+        try:
+            # A command of the same kind that is already on its way means several zones are being changed at once,
+            # e.g. by one service call, so wait for the rest of them. A command on its own is sent straight away.
+            if self._commands_in_flight[batch.command]:
+                await asyncio.sleep(self._command_batch_window)
+        finally:
+            del self._command_batches[batch_key]
+
+        if len(batch.names) > 1:
+            _LOGGER.debug(f"Merged {batch.command} for {len(batch.names)} zones into one message")
+
+        self._commands_in_flight[batch.command] += 1
+        try:
+            return await self._send_now(batch.message, expected_reply)
+        finally:
+            self._commands_in_flight[batch.command] -= 1
+
+    async def _send_now(self, message, expected_reply=None):
+        """Send a message to the hub once a connection is free, letting the listeners know when it is a command."""
+        stats = self.stats
+        stats["requests"] += 1
+        stats["queue_depth"] += 1
+        stats["max_queue_depth"] = max(stats["max_queue_depth"], stats["queue_depth"])
+        queued = True
+        try:
+            # Callers wait here while the hub is busy, rather than opening more connections than it will accept.
+            async with self._connection_slots, self._request_slots:
+                queued = False
+                stats["queue_depth"] -= 1
+                stats["in_flight"] += 1
+                websocket = self._websocket
+                start = time.perf_counter()
+                try:
+                    result = await super()._send(message, expected_reply)
+                except ConnectionClosed as err:
+                    # neohubapi only handles a connection closed with an error. One the hub closed cleanly while
+                    # answering, e.g. as it restarts, is the same to the caller, the next request opens a new one.
+                    raise NeoHubConnectionError(err) from err
+                finally:
+                    stats["in_flight"] -= 1
+                    if websocket is not None and websocket is self._websocket:
+                        stats["connections_reused"] += 1
+                    else:
+                        stats["connections_opened"] += 1
+                self._record_latency(time.perf_counter() - start)
+        finally:
+            if queued:
+                stats["queue_depth"] -= 1
+
+        # Commands are the only messages that are sent with an expected reply, requests for data are not.
+        if expected_reply is not None:
+            self._notify_command_listeners(result)
+
+        return result
+
+    def _notify_command_listeners(self, result):
+        for listener in list(self._command_listeners):
+            listener(result)
+
+    def _record_latency(self, seconds):
+        """Record how long the hub took to answer a request."""
+        stats = self.stats
+        latency_ms = round(seconds * 1000, 3)
+        stats["completed"] += 1
+        stats["last_latency_ms"] = latency_ms
+        stats["max_latency_ms"] = max(stats["max_latency_ms"] or 0, latency_ms)
+        average = stats["average_latency_ms"] or 0
+        stats["average_latency_ms"] = round(average + (latency_ms - average) / stats["completed"], 3)
+
+    async def _send_message(self, reader, writer, message):
+        """Send a message over the legacy API, counting the size of the reply."""
+        data = await super()._send_message(reader, writer, message)
+        self.bytes_received += len(data)
+        return data
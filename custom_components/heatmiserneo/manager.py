@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""
+Manager for all of the NeoHubs set up in Home Assistant.
+
+Each config entry has its own hub client and coordinator. The manager caps the number of requests in flight across all
+of the hubs, and spreads the hubs' polls over their interval so that several hubs don't all refresh at the same moment.
+"""
+
+import asyncio
+import logging
+
+from .const import DEFAULT_MAX_IN_FLIGHT_REQUESTS
+from .hub import HeatmiserNeoHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HeatmiserNeoHubManager:
+    """Shares request limits and poll scheduling between the NeoHubs."""
+
+    def __init__(self, max_in_flight_requests=DEFAULT_MAX_IN_FLIGHT_REQUESTS):
+        self._request_slots = asyncio.Semaphore(max_in_flight_requests)
+        self._hubs = {}
+        self._coordinators = {}
+
+    def create_hub(self, entry_id, host, port, token=None):
+        """Create the client for a hub, sharing the request limit with the other hubs."""
+        hub = HeatmiserNeoHub(host, port, token=token, request_slots=self._request_slots)
+        self._hubs[entry_id] = (host, hub)
+        return hub
+
+    def add_coordinator(self, entry_id, coordinator):
+        """Start managing the polls of a hub's coordinator."""
+        self._coordinators[entry_id] = coordinator
+        self._update_poll_phases()
+
+    def remove(self, entry_id):
+        """Stop managing a hub and its coordinator."""
+        self._hubs.pop(entry_id, None)
+        if self._coordinators.pop(entry_id, None) is not None:
+            self._update_poll_phases()
+
+    def _update_poll_phases(self):
+        """Spread the coordinators' polls evenly over their interval."""
+        coordinators = list(self._coordinators.values())
+        for index, coordinator in enumerate(coordinators):
+            coordinator.poll_phase = index / len(coordinators)
+        _LOGGER.debug(f"Staggered polling across {len(coordinators)} hubs")
+
+    @property
+    def stats(self):
+        """Return the request statistics of every hub, keyed by host."""
+        return {host: hub.stats for host, hub in self._hubs.values()}
@@ -0,0 +1,183 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""
+Device data used by the integration.
+
+The coordinator builds a NeoDevice for every device on each refresh, parsing and range checking the hub's data once so
+the entities don't have to. NeoDevices can't be changed, optimistic updates replace the device through the coordinator
+instead.
+"""
+
+from datetime import timedelta
+
+from .const import device_capabilities
+
+# Temperatures outside these ranges aren't real readings, they're reported when a device loses its connection to the hub.
+VALID_TEMPERATURE_RANGES = {
+    "C": (-50.0, 70.0),
+    "F": (-58.0, 158.0),
+}
+
+# Reported as the floor temperature by devices without a floor probe, whatever the hub's temperature unit. In
+# Fahrenheit it is inside the valid range, so it has to be checked for explicitly.
+NO_FLOOR_PROBE = 127
+
+
+def _float(value):
+    """Return the value as a float, or None if the hub sent something that isn't a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _reading(device, key, temperature_unit, invalid_readings=None):
+    """
+    Return a measured temperature, or None if it is missing or out of range.
+
+    The key is added to invalid_readings, if given, when the hub sent a reading that isn't valid.
+    """
+    raw_value = getattr(device, key, None)
+    if raw_value is None:
+        return None
+
+    value = _float(raw_value)
+    minimum, maximum = VALID_TEMPERATURE_RANGES.get(temperature_unit, (float("-inf"), float("inf")))
+    if value is None or not minimum <= value <= maximum:
+        if invalid_readings is not None:
+            invalid_readings.append(key)
+        return None
+    return value
+
+
+def _floor_reading(device, temperature_unit):
+    """Return the floor temperature, or None if the device has no floor probe or the reading is out of range."""
+    if _float(getattr(device, 'CURRENT_FLOOR_TEMPERATURE', None)) == NO_FLOOR_PROBE:
+        return None
+    # Out of range readings aren't listed as invalid, as some devices without a probe send other values.
+    return _reading(device, 'CURRENT_FLOOR_TEMPERATURE', temperature_unit)
+
+
+def _hold_time(value):
+    """Parse a HOLD_TIME such as '1:30', which can go up to 99:99."""
+    try:
+        hours, minutes = (int(part) for part in str(value).split(':')[:2])
+    except ValueError:
+        return timedelta(0)
+    return timedelta(hours=hours, minutes=minutes)
+
+
+def _hold_time_text(hold_time):
+    """Format a hold time as hours and minutes, e.g. '1:30'."""
+    if hold_time is None:
+        return None
+    minutes = int(hold_time.total_seconds()) // 60
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+class NeoDevice:
+    """An immutable snapshot of a device's data from the hub."""
+
+    __slots__ = (
+        'active_profile',
+        'available_modes',
+        'capabilities',
+        'cool_on',
+        'cool_temp',
+        'current_floor_temperature',
+        'device_id',
+        'device_type',
+        'fan_control',
+        'fan_speed',
+        'hc_mode',
+        'heat_on',
+        'hold_on',
+        'hold_temp',
+        'hold_time',
+        'hold_time_text',
+        'invalid_readings',
+        'low_battery',
+        'manual_off',
+        'name',
+        'offline',
+        'preheat_active',
+        'sensor_mode',
+        'serial_number',
+        'standby',
+        'stat_version',
+        'target_temperature',
+        'temperature',
+        'time_clock_mode',
+        'timer_on',
+        'window_open',
+    )
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            object.__setattr__(self, field, fields.get(field))
+        # Derived from the hold time, so that it stays right when the hold time is replaced.
+        object.__setattr__(self, 'hold_time_text', _hold_time_text(self.hold_time))
+        object.__setattr__(self, 'invalid_readings', tuple(fields.get('invalid_readings') or ()))
+
+    @classmethod
+    def from_hub_data(cls, device, serial_number, temperature_unit=None):
+        """
+        Build a device from the hub's live data for it, with the engineers data merged in.
+
+        Readings that are out of range for the hub's temperature unit are set to None, and their keys listed in
+        invalid_readings.
+        """
+        device_type = getattr(device, 'DEVICE_TYPE', None)
+        invalid_readings = []
+        return cls(
+            active_profile=getattr(device, 'ACTIVE_PROFILE', None),
+            available_modes=tuple(getattr(device, 'AVAILABLE_MODES', None) or ()),
+            capabilities=device_capabilities(device_type),
+            cool_on=bool(getattr(device, 'COOL_ON', False)),
+            cool_temp=_float(getattr(device, 'COOL_TEMP', None)),
+            current_floor_temperature=_floor_reading(device, temperature_unit),
+            device_id=device.DEVICE_ID,
+            device_type=device_type,
+            fan_control=getattr(device, 'FAN_CONTROL', None),
+            fan_speed=getattr(device, 'FAN_SPEED', None),
+            # There's a known bug in the API for the NeoStat V1, which is always heating.
+            hc_mode="HEATING" if device_type == 1 else getattr(device, 'HC_MODE', None),
+            heat_on=bool(getattr(device, 'HEAT_ON', False)),
+            hold_on=bool(getattr(device, 'HOLD_ON', False)),
+            hold_temp=_float(getattr(device, 'HOLD_TEMP', None)),
+            hold_time=_hold_time(getattr(device, 'HOLD_TIME', None)),
+            invalid_readings=invalid_readings,
+            low_battery=bool(getattr(device, 'LOW_BATTERY', False)),
+            manual_off=bool(getattr(device, 'MANUAL_OFF', False)),
+            name=getattr(device, 'ZONE_NAME', getattr(device, 'device', None)),
+            offline=bool(getattr(device, 'OFFLINE', False)),
+            preheat_active=bool(getattr(device, 'PREHEAT_ACTIVE', False)),
+            sensor_mode=getattr(device, 'SENSOR_MODE', None),
+            serial_number=serial_number,
+            standby=bool(getattr(device, 'STANDBY', False)),
+            stat_version=getattr(device, 'STAT_VERSION', None),
+            target_temperature=_float(getattr(device, 'SET_TEMP', None)),
+            temperature=_reading(device, 'ACTUAL_TEMP', temperature_unit, invalid_readings),
+            # Only devices in time clock mode report TIMECLOCK.
+            time_clock_mode=hasattr(device, 'TIMECLOCK'),
+            timer_on=bool(getattr(device, 'TIMER_ON', False)),
+            window_open=bool(getattr(device, 'WINDOW_OPEN', False)),
+        )
+
+    def replace(self, **changes):
+        """Return a copy of the device with some of its fields changed."""
+        return NeoDevice(**{**{field: getattr(self, field) for field in self.__slots__}, **changes})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} can't be changed, use replace() instead")
+
+    def __eq__(self, other):
+        if not isinstance(other, NeoDevice):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({fields})"
@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""
+Heating profiles of the zones on a NeoHub.
+
+The profiles are fetched from the hub when its profile change markers move, or when a zone uses a profile that hasn't
+been fetched yet. Each zone's next scheduled change is worked out from the cached profiles, rather than by asking the
+hub again.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Change markers reported by GET_LIVE_DATA for the stored profiles, and for the zones that have their own (profile 0).
+TIMESTAMP_PROFILE_COMFORT_LEVELS = "TIMESTAMP_PROFILE_COMFORT_LEVELS"
+TIMESTAMP_PROFILE_0 = "TIMESTAMP_PROFILE_0"
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+class ScheduledChange(NamedTuple):
+    """The next comfort level a zone's profile switches to."""
+
+    time: datetime
+    temperature: float
+
+
+def _parse_profile(info):
+    """Turn a profile's levels, e.g. {'monday': {'wake': ['07:00', 21, 4, True], ...}}, into sorted (time, temp)."""
+    schedule = {}
+    for day, levels in vars(info).items():
+        changes = []
+        for level in vars(levels).values():
+            try:
+                hours, minutes = (int(part) for part in level[0].split(':'))
+                # Unused levels are set to 24:00, which isn't a valid time.
+                changes.append((time(hours, minutes), float(level[1])))
+            except (AttributeError, IndexError, TypeError, ValueError):
+                continue
+        schedule[day] = tuple(sorted(changes))
+    return schedule
+
+
+class HeatmiserNeoProfiles:
+    """Cache of the heating profiles on a hub."""
+
+    def __init__(self, hub):
+        self._hub = hub
+        self._timestamps = {}
+        # Stored profiles by PROFILE_ID, and the profiles of zones that don't use a stored one by zone name.
+        self._profiles = None
+        self._zone_profiles = {}
+
+    @staticmethod
+    def _profile_zones(live_data):
+        """Return the names of the thermostats that have their own profile, rather than a stored one."""
+        return [
+            device.ZONE_NAME for device in live_data.devices
+            if getattr(device, 'THERMOSTAT', False)
+            and not hasattr(device, 'TIMECLOCK')
+            and getattr(device, 'ACTIVE_PROFILE', None) == 0
+        ]
+
+    def _is_stale(self, live_data, marker):
+        """Return true if the profiles behind a change marker need to be fetched again."""
+        # Unlike the other hub data, profiles are only fetched once if the firmware doesn't report the marker.
+        return marker not in self._timestamps or self._timestamps[marker] != getattr(live_data, marker, None)
+
+    def refresh_request(self, live_data):
+        """Return a function that fetches the profiles that are out of date, or None if they are all current."""
+        fetch_profiles = self._profiles is None or self._is_stale(live_data, TIMESTAMP_PROFILE_COMFORT_LEVELS)
+
+        zones = self._profile_zones(live_data)
+        zones_stale = self._is_stale(live_data, TIMESTAMP_PROFILE_0)
+        if zones_stale and not zones:
+            # No zone has its own profile, so there is nothing to fetch for the marker.
+            self._zone_profiles = {}
+            self._timestamps[TIMESTAMP_PROFILE_0] = getattr(live_data, TIMESTAMP_PROFILE_0, None)
+            zones_stale = False
+            fetch_zones = []
+        elif zones_stale:
+            fetch_zones = zones
+        else:
+            # Zones that have only just switched to their own profile, or were only just added.
+            fetch_zones = [zone for zone in zones if zone not in self._zone_profiles]
+
+        if not fetch_profiles and not fetch_zones:
+            return None
+
+        async def async_refresh():
+            await self._async_refresh(live_data, fetch_profiles, fetch_zones, zones_stale)
+            return True
+
+        return async_refresh
+
+    async def _async_refresh(self, live_data, fetch_profiles, fetch_zones, zones_stale):
+        """Fetch the stored profiles and the zones' own profiles side by side."""
+        requests = [self._hub.get_profile_0(zone) for zone in fetch_zones]
+        if fetch_profiles:
+            requests.append(self._hub.get_profiles())
+        results = await asyncio.gather(*requests)
+
+        if fetch_profiles:
+            profiles = {}
+            for profile in vars(results.pop()).values():
+                if getattr(profile, 'PROFILE_ID', None) is not None and hasattr(profile, 'info'):
+                    profiles[profile.PROFILE_ID] = _parse_profile(profile.info)
+            self._profiles = profiles
+            self._timestamps[TIMESTAMP_PROFILE_COMFORT_LEVELS] = getattr(
+                live_data, TIMESTAMP_PROFILE_COMFORT_LEVELS, None
+            )
+
+        # Every zone was fetched if the marker moved, which also drops zones that have been removed.
+        zone_profiles = {} if zones_stale else self._zone_profiles
+        for zone, result in zip(fetch_zones, results):
+            # A zone without any levels gets an empty profile, so it isn't fetched again until the marker moves.
+            info = getattr(result, 'info', None)
+            zone_profiles[zone] = _parse_profile(info) if info is not None else {}
+        self._zone_profiles = zone_profiles
+        if zones_stale:
+            self._timestamps[TIMESTAMP_PROFILE_0] = getattr(live_data, TIMESTAMP_PROFILE_0, None)
+
+        _LOGGER.debug(f"Fetched {len(self._profiles)} profiles and {len(fetch_zones)} zone profiles")
+
+    @staticmethod
+    def _day_changes(schedule, schedule_format, day):
+        """Return the changes for a day, for hubs that share levels between days the first day of the group is used."""
+        if schedule_format == "24HOURSFIXED":
+            keys = ("monday", WEEKDAYS[day.weekday()])
+        elif schedule_format == "5DAY/2DAY":
+            keys = ("sunday" if day.weekday() >= 5 else "monday", WEEKDAYS[day.weekday()])
+        else:
+            keys = (WEEKDAYS[day.weekday()],)
+
+        for key in keys:
+            if key in schedule:
+                return schedule[key]
+        return ()
+
+    def next_change(self, device, schedule_format, now):
+        """Return the next ScheduledChange in a thermostat's profile after now, or None if it has no schedule."""
+        if schedule_format == "NONPROGRAMMABLE" or device.active_profile is None:
+            return None
+
+        if device.active_profile == 0:
+            schedule = self._zone_profiles.get(device.name)
+        else:
+            schedule = (self._profiles or {}).get(device.active_profile)
+        if not schedule:
+            return None
+
+        # Look a day past a week ahead, so a profile with one change a week still finds it.
+        for days in range(8):
+            day = now.date() + timedelta(days=days)
+            for at, temperature in self._day_changes(schedule, schedule_format, day):
+                change_time = datetime.combine(day, at, tzinfo=now.tzinfo)
+                if change_time > now:
+                    return ScheduledChange(change_time, temperature)
+        return None
@@ -5,17 +5,31 @@ homeassistant.components.sensor.heatmiserneo
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 Heatmiser Neo Sensors via Heatmiser Neo-hub
+
+Each sensor is described by a row in one of the tables below, which says which devices have it and how its state is
+read from the device's data. Adding a sensor only needs a new row.
 """
 
-import logging    
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
 
 _LOGGER = logging.getLogger(__name__)
 
-from .const import COORDINATOR, DOMAIN, HUB, HEATMISER_PRODUCT_LIST
-from neohubapi.neohub import NeoHub, NeoStat
-from homeassistant.components.binary_sensor import BinarySensorEntity, BinarySensorDeviceClass
-from homeassistant.components.sensor import SensorEntity, SensorDeviceClass
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, CoordinatorEntity
+from .const import COORDINATOR, DOMAIN, HEATMISER_PRODUCT_LIST, DeviceCapability
+from .entity import HeatmiserNeoEntity
+from .models import NeoDevice
+from .profiles import ScheduledChange
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorEntityDescription
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 SENSORS_ENABLED = True
 OFFLINE_SENSOR_ENABLED = True
@@ -26,8 +40,167 @@ ICON_NETWORK_OFFLINE = "mdi:network-off-outline"
 ICON_NETWORK_ONLINE = "mdi:network-outline"
 
 
+def _is_heating_thermostat(device: NeoDevice) -> bool:
+    return DeviceCapability.HEAT in device.capabilities and not device.time_clock_mode
+
+
+def _device_attributes(device: NeoDevice) -> dict[str, Any]:
+    return {
+        'device_id': device.device_id,
+        'device_type': device.device_type,
+        'offline': device.offline
+    }
+
+
+def _battery_device_attributes(device: NeoDevice) -> dict[str, Any]:
+    return {
+        'device_id': device.device_id,
+        'device_type': device.device_type,
+        'low_battery': device.low_battery,
+        'offline': device.offline
+    }
+
+
+def _contact_icon(device: NeoDevice) -> str:
+    if device.offline:
+        return ICON_NETWORK_OFFLINE
+    if device.window_open:
+        return "mdi:electric-switch"
+    return "mdi:electric-switch-closed"
+
+
+@dataclass(frozen=True, kw_only=True)
+class HeatmiserNeoSensorEntityDescription(SensorEntityDescription):
+    """
+    Describes a sensor of a device on a NeoHub.
+
+    The key is the end of the unique ID, and the name is added to the device's name and model.
+    """
+
+    supported_fn: Callable[[NeoDevice], bool]
+    value_fn: Callable[[Any], Any]
+    icon_fn: Callable[[NeoDevice], str | None] | None = None
+    attributes_fn: Callable[[NeoDevice], dict[str, Any]] | None = None
+    # Whether the entity stays available while the device is offline.
+    available_offline: bool = False
+
+
+@dataclass(frozen=True, kw_only=True)
+class HeatmiserNeoBinarySensorEntityDescription(BinarySensorEntityDescription):
+    """Describes a binary sensor of a device on a NeoHub, see HeatmiserNeoSensorEntityDescription."""
+
+    supported_fn: Callable[[NeoDevice], bool]
+    value_fn: Callable[[NeoDevice], bool]
+    icon_fn: Callable[[NeoDevice], str | None] | None = None
+    attributes_fn: Callable[[NeoDevice], dict[str, Any]] | None = None
+    available_offline: bool = False
+
+
+SENSORS = (
+    HeatmiserNeoSensorEntityDescription(
+        key="heatmiser_neo_hold_time_sensor",
+        name="Hold Time Remaining",
+        supported_fn=lambda device: DeviceCapability.HOLD in device.capabilities,
+        value_fn=lambda device: device.hold_time,
+        attributes_fn=_device_attributes,
+    ),
+    HeatmiserNeoSensorEntityDescription(
+        key="heatmiser_neo_temperature_sensor",
+        name="Temperature",
+        device_class=SensorDeviceClass.TEMPERATURE,
+        # Sensor has a temperature sensing element
+        supported_fn=lambda device: DeviceCapability.TEMPERATURE_SENSOR in device.capabilities,
+        value_fn=lambda device: device.temperature,
+        icon_fn=lambda device: "mdi:thermometer-alert" if device.offline else "mdi:thermometer-auto",
+        attributes_fn=_battery_device_attributes,
+    ),
+    HeatmiserNeoSensorEntityDescription(
+        key="heatmiser_neo_floor_temperature_sensor",
+        name="Floor Temperature",
+        device_class=SensorDeviceClass.TEMPERATURE,
+        # Only thermostats with a floor probe report a floor temperature.
+        supported_fn=lambda device: (
+            DeviceCapability.HEAT in device.capabilities and device.current_floor_temperature is not None
+        ),
+        value_fn=lambda device: device.current_floor_temperature,
+        attributes_fn=_device_attributes,
+    ),
+)
+
+BINARY_SENSORS = (
+    HeatmiserNeoBinarySensorEntityDescription(
+        key="device_offline_sensor",
+        name="Device Connectivity",
+        device_class=BinarySensorDeviceClass.CONNECTIVITY,
+        # TODO: Move this to configuration.
+        supported_fn=lambda device: OFFLINE_SENSOR_ENABLED,
+        value_fn=lambda device: not device.offline,
+        icon_fn=lambda device: ICON_NETWORK_OFFLINE if device.offline else ICON_NETWORK_ONLINE,
+        # This has to always be available otherwise it will never work.
+        available_offline=True,
+    ),
+    HeatmiserNeoBinarySensorEntityDescription(
+        key="heatmiser_neo_contact_sensor",
+        name="Contact Sensor",
+        device_class=BinarySensorDeviceClass.OPENING,
+        # Sensor has a binary sensing element (Window Door Sensor)
+        supported_fn=lambda device: DeviceCapability.CONTACT_SENSOR in device.capabilities,
+        value_fn=lambda device: device.window_open,
+        icon_fn=_contact_icon,
+        attributes_fn=_battery_device_attributes,
+    ),
+    HeatmiserNeoBinarySensorEntityDescription(
+        key="heatmiser_neo_device_hold_active",
+        name="Hold Active",
+        device_class=BinarySensorDeviceClass.PROBLEM,
+        supported_fn=lambda device: DeviceCapability.HOLD in device.capabilities,
+        value_fn=lambda device: device.hold_on,
+    ),
+    HeatmiserNeoBinarySensorEntityDescription(
+        key="heatmiser_neo_battery_level_sensor",
+        name="Battery Low",
+        device_class=BinarySensorDeviceClass.BATTERY,
+        supported_fn=lambda device: DeviceCapability.BATTERY in device.capabilities,
+        value_fn=lambda device: device.low_battery,
+    ),
+    HeatmiserNeoBinarySensorEntityDescription(
+        key="heatmiser_neo_device_timer_output_active",
+        name="Timer Output Active",
+        # Thermostats in Time Clock mode
+        supported_fn=lambda device: DeviceCapability.TIMECLOCK in device.capabilities and device.time_clock_mode,
+        value_fn=lambda device: device.timer_on,
+    ),
+    HeatmiserNeoBinarySensorEntityDescription(
+        key="heatmiser_neo_heat_demand_sensor",
+        name="Heat Demand",
+        device_class=BinarySensorDeviceClass.HEAT,
+        supported_fn=_is_heating_thermostat,
+        value_fn=lambda device: device.heat_on,
+    ),
+)
+
+# Worked out from the thermostat's heating profile, their value_fn is given the next ScheduledChange.
+SCHEDULE_SENSORS = (
+    HeatmiserNeoSensorEntityDescription(
+        key="heatmiser_neo_next_setpoint_sensor",
+        name="Next Setpoint",
+        device_class=SensorDeviceClass.TEMPERATURE,
+        icon="mdi:thermometer-chevron-up",
+        supported_fn=_is_heating_thermostat,
+        value_fn=lambda next_change: next_change.temperature,
+    ),
+    HeatmiserNeoSensorEntityDescription(
+        key="heatmiser_neo_next_setpoint_time_sensor",
+        name="Next Setpoint Time",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        icon="mdi:clock-outline",
+        supported_fn=_is_heating_thermostat,
+        value_fn=lambda next_change: next_change.time,
+    ),
+)
+
+
 async def async_setup_entry(hass, entry, async_add_entities):
-    hub = hass.data[DOMAIN][entry.entry_id][HUB]
     coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
 
     if coordinator.data is None:
@@ -39,558 +212,193 @@ async def async_setup_entry(hass, entry, async_add_entities):
     temperature_unit = system_data.CORF
 
     if SENSORS_ENABLED:  # Todo: Placeholder, move this to Hub configuration
-        neo_devices = {device.name: device for device in devices_data['neo_devices']}
+        neo_devices = devices_data['neo_devices_by_name']
         _LOGGER.debug(f"Heatmiser Neo Devices: {neo_devices}")
 
-        # Todo: Add all devices, Thermostats, timeclocks the lot.
         list_of_neo_devices = []
-
         for neo_device in neo_devices.values():
-            # Sensor has a binary sensing element (Window Door Sensor)
-            if neo_device.device_type == 5:
-                list_of_neo_devices.append(HeatmiserNeoContactSensor(neo_device, coordinator, hub))
-
-            if neo_device.device_type in [1, 2, 6, 7, 12, 13]:
-                list_of_neo_devices.append(HeatmiserNeoHoldTimeSensor(neo_device, coordinator, hub))
-                list_of_neo_devices.append(HeatmiserNeoHoldActiveSensor(neo_device, coordinator))
-
-            # Thermostats in Time Clock mode
-            if (neo_device.device_type in [1, 2, 7, 12, 13]) and neo_device.time_clock_mode:
-                list_of_neo_devices.append(HeatmiserNeoTimerOutputActiveSensor(neo_device, coordinator))
-            
-            # Sensor has a temperature sensing element
-            if neo_device.device_type == 14:
-                list_of_neo_devices.append(
-                    HeatmiserNeoTemperatureSensor(neo_device, coordinator, hub, temperature_unit))
-
-            # Is the device battery powered?
-            if neo_device.battery_powered:
-                list_of_neo_devices.append(NeoBatterySensor(neo_device, coordinator))
-
-            # TODO: Move this to configuration.
-            if OFFLINE_SENSOR_ENABLED:
-                list_of_neo_devices.append(NeoOfflineBinarySensor(neo_device, coordinator))
+            list_of_neo_devices.extend(
+                HeatmiserNeoSensor(neo_device, coordinator, description, temperature_unit)
+                for description in SENSORS if description.supported_fn(neo_device)
+            )
+            list_of_neo_devices.extend(
+                HeatmiserNeoBinarySensor(neo_device, coordinator, description)
+                for description in BINARY_SENSORS if description.supported_fn(neo_device)
+            )
+            list_of_neo_devices.extend(
+                HeatmiserNeoScheduleSensor(neo_device, coordinator, description, temperature_unit)
+                for description in SCHEDULE_SENSORS if description.supported_fn(neo_device)
+            )
 
         _LOGGER.info(f"Adding Sensors: {list_of_neo_devices}")
         async_add_entities(list_of_neo_devices, True)
 
 
-class NeoOfflineBinarySensor(CoordinatorEntity, BinarySensorEntity):
-    """Represents a Heatmiser Neostat offline binary sensor"""
-
-    def __init__(self, neosensor: NeoStat, coordinator: DataUpdateCoordinator):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neosensor.device_id} Name: {neosensor.name}")
-
-        self._neosensor = neosensor
-        self._coordinator = coordinator
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        thermostats = {device.name: device for device in devices['neo_devices']}
-        return thermostats[self._neosensor.name]
-
-    @property
-    def device_class(self):
-        return BinarySensorDeviceClass.CONNECTIVITY
-
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return f"{self._neosensor.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neosensor.device_type]} Device Connectivity"
-
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
+class HeatmiserNeoSensor(HeatmiserNeoEntity, SensorEntity):
+    """Represents a sensor of a Heatmiser Neo device, as set out by its description"""
 
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        # This has to always be available otherwise it will never work.
-        return True
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neosensor.name}_{self._coordinator.serial_number}_{self._neosensor.serial_number}_device_offline_sensor"
-
-    @property
-    def is_on(self):
-        """Return true if the binary sensor is on. i.e. Neo Device is offline"""
-        return not bool(self.data.offline)
-
-    @property
-    def icon(self):
-        if self.data.offline:
-            return ICON_NETWORK_OFFLINE
-
-        return ICON_NETWORK_ONLINE
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neosensor.serial_number}")},
-            "name": self._neosensor.name,
-            "manufacturer": "Heatmiser",
-            "serial_number": self._neosensor.serial_number,
-            "suggested_area": self._neosensor.name,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
-
-
-class HeatmiserNeoContactSensor(CoordinatorEntity, BinarySensorEntity):
-    """Represents a Heatmiser Neostat Contact Sensor"""
+    entity_description: HeatmiserNeoSensorEntityDescription
 
     def __init__(
             self,
-            neosensor: NeoStat,
+            neostat: NeoDevice,
             coordinator: DataUpdateCoordinator,
-            hub: NeoHub
+            description: HeatmiserNeoSensorEntityDescription,
+            unit_of_measurement
     ):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neosensor.device_id} Name: {neosensor.name}")
+        self.entity_description = description
+        self._unique_id_suffix = description.key
+        super().__init__(neostat, coordinator)
 
-        self._neosensor = neosensor
-        self._coordinator = coordinator
-        self._hub = hub
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        contact_sensors = {device.name: device for device in devices['neo_devices']}
-        return contact_sensors[self._neosensor.name]
+        if description.device_class == SensorDeviceClass.TEMPERATURE:
+            self._attr_native_unit_of_measurement = {"C": "°C", "F": "°F"}.get(unit_of_measurement)
 
     @property
     def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
-
-    @property
-    def device_class(self):
-        return BinarySensorDeviceClass.OPENING
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neosensor.serial_number}")},
-            "name": self._neosensor.name,
-            "manufacturer": "Heatmiser",
-            "model": f"{HEATMISER_PRODUCT_LIST[self.data.device_type]}",
-            "serial_number": self._neosensor.serial_number,
-            "suggested_area": self._neosensor.name,
-            "sw_version": self._neosensor.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
+        """Return true if the entity is available, some stay available while the device is offline."""
+        if self.entity_description.available_offline:
+            return self.data is not None and not self._coordinator.restored
+        return super().available
 
     @property
     def extra_state_attributes(self):
-        """Return additional state attributes."""
-        attributes = {
-            'device_id': self._neosensor.device_id,
-            'device_type': self._neosensor.device_type,
-            'low_battery': self.data.low_battery,
-            'offline': self.data.offline
-        }
-        return attributes
+        """Return the additional state attributes."""
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self.data)
 
     @property
     def icon(self):
-        if self.data.offline:
-            return "mdi:network-off-outline"
-
-        if self.data.window_open:
-            return "mdi:electric-switch"
-
-        if not self.data.window_open:
-            return "mdi:electric-switch-closed"
-
-        return "mdi:image-broken-variant"
-
-    @property
-    def is_on(self):
-        """Return true if the binary sensor is on. i.e. Contacts are open"""
-        return bool(self.data.window_open)
+        if self.entity_description.icon_fn is None or self.data is None:
+            return super().icon
+        return self.entity_description.icon_fn(self.data)
 
     @property
     def name(self):
         """Return the name of the sensor."""
-        return f"{self._neosensor.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neosensor.device_type]} Contact Sensor"
-
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neosensor.name}_{self._coordinator.serial_number}_{self._neosensor.serial_number}_heatmiser_neo_contact_sensor"
-
-
-class HeatmiserNeoHoldActiveSensor(CoordinatorEntity, BinarySensorEntity):
-    """Represents a Heatmiser Neostat offline binary sensor"""
-
-    def __init__(self, neostat: NeoStat, coordinator: DataUpdateCoordinator):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neostat.device_id} Name: {neostat.name}")
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        thermostats = {device.name: device for device in devices['neo_devices']}
-        return thermostats[self._neostat.name]
-
-    @property
-    def device_class(self):
-        return BinarySensorDeviceClass.NONE
+        return (
+            f"{self._neostat.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neostat.device_type]} "
+            f"{self.entity_description.name}"
+        )
 
     @property
-    def name(self):
-        """Return the name of the sensor."""
-        return f"{self._neostat.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neostat.device_type]} Hold Active"
-
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neo_device_hold_active"
-
-    @property
-    def is_on(self):
-        """Return true if the binary sensor is on. i.e. Neo Device is offline"""
-        return bool(self.data.hold_on)
-
-    @property
-    def device_class(self):
-        return BinarySensorDeviceClass.PROBLEM
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self.entity_description.value_fn(self.data)
 
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
 
+class HeatmiserNeoBinarySensor(HeatmiserNeoEntity, BinarySensorEntity):
+    """Represents a binary sensor of a Heatmiser Neo device, as set out by its description"""
 
-class HeatmiserNeoHoldTimeSensor(CoordinatorEntity, SensorEntity):
-    """Represents A Heatmiser Device with a Hold Time"""
+    entity_description: HeatmiserNeoBinarySensorEntityDescription
 
     def __init__(
             self,
-            neostat: NeoStat,
+            neostat: NeoDevice,
             coordinator: DataUpdateCoordinator,
-            hub: NeoHub
+            description: HeatmiserNeoBinarySensorEntityDescription
     ):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neostat.device_id} Name: {neostat.name}")
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-        self._hub = hub
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        temperature_sensors = {device.name: device for device in devices['neo_devices']}
-        return temperature_sensors[self._neostat.name]
+        self.entity_description = description
+        self._unique_id_suffix = description.key
+        super().__init__(neostat, coordinator)
 
     @property
     def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
-
-    @property
-    def device_class(self):
-        return None
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
+        """Return true if the entity is available, some stay available while the device is offline."""
+        if self.entity_description.available_offline:
+            return self.data is not None and not self._coordinator.restored
+        return super().available
 
     @property
     def extra_state_attributes(self):
         """Return the additional state attributes."""
-        attributes = {
-            'device_id': self._neostat.device_id,
-            'device_type': self._neostat.device_type,
-            'offline': self.data.offline
-        }
-        return attributes
-        
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return f"{self._neostat.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neostat.device_type]} Hold Time Remaining"
-
-    @property
-    def native_value(self):
-        """Return the sensors temperature value."""
-        if self.data.offline:
+        if self.entity_description.attributes_fn is None:
             return None
-        return self.data.hold_time
-
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
+        return self.entity_description.attributes_fn(self.data)
 
     @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neo_hold_time_sensor"
-
-
-class NeoBatterySensor(CoordinatorEntity, BinarySensorEntity):
-    """Represents the battery status of the thermostat"""
-
-    def __init__(self, neosensor: NeoStat, coordinator: DataUpdateCoordinator):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neosensor.device_id} Name: {neosensor.name}")
-
-        self._neosensor = neosensor
-        self._coordinator = coordinator
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        thermostats = {device.name: device for device in devices['neo_devices']}
-        return thermostats[self._neosensor.name]
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
-
-    @property
-    def device_class(self):
-        return BinarySensorDeviceClass.BATTERY
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neosensor.serial_number}")},
-            "name": self._neosensor.name,
-            "manufacturer": "Heatmiser",
-            "serial_number": self._neosensor.serial_number,
-            "suggested_area": self._neosensor.name,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
+    def icon(self):
+        if self.entity_description.icon_fn is None or self.data is None:
+            return super().icon
+        return self.entity_description.icon_fn(self.data)
 
     @property
     def is_on(self):
-        """Return true if the binary sensor is on. i.e. Contacts are open"""
-        return bool(self.data.low_battery)
+        """Return true if the binary sensor is on."""
+        return bool(self.entity_description.value_fn(self.data))
 
     @property
     def name(self):
         """Return the name of the sensor."""
-        return f"{self._neosensor.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neosensor.device_type]} Battery Low"
+        return (
+            f"{self._neostat.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neostat.device_type]} "
+            f"{self.entity_description.name}"
+        )
 
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neosensor.name}_{self._coordinator.serial_number}_{self._neosensor.serial_number}_heatmiser_neo_battery_level_sensor"
 
-
-class HeatmiserNeoTemperatureSensor(CoordinatorEntity, SensorEntity):
-    """Represents A Heatmiser Temperature Sensor"""
+class HeatmiserNeoScheduleSensor(HeatmiserNeoSensor):
+    """Represents a thermostat's next scheduled change, worked out from the cached profiles"""
 
     def __init__(
             self,
-            neosensor: NeoStat,
+            neostat: NeoDevice,
             coordinator: DataUpdateCoordinator,
-            hub: NeoHub,
+            description: HeatmiserNeoSensorEntityDescription,
             unit_of_measurement
     ):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neosensor.device_id} Name: {neosensor.name}")
-
-        self._neosensor = neosensor
-        self._coordinator = coordinator
-        self._hub = hub
-        self._unit_of_measurement = unit_of_measurement
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        temperature_sensors = {device.name: device for device in devices['neo_devices']}
-        return temperature_sensors[self._neosensor.name]
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
-
-    @property
-    def device_class(self):
-        return SensorDeviceClass.TEMPERATURE
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neosensor.serial_number}")},
-            "name": self._neosensor.name,
-            "manufacturer": "Heatmiser",
-            "serial_number": self._neosensor.serial_number,
-            "suggested_area": self._neosensor.name,
-            "sw_version": self.data.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
+        super().__init__(neostat, coordinator, description, unit_of_measurement)
+        self._next_change: ScheduledChange | None = None
+        self._remove_next_change_listener = None
+
+    async def async_added_to_hass(self):
+        """Work out the next change once added, and stop waiting for it once removed."""
+        await super().async_added_to_hass()
+        self._update_next_change()
+        self.async_on_remove(self._cancel_next_change_listener)
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Work out the next change again, the device or its profile has changed."""
+        self._update_next_change()
+        super()._handle_coordinator_update()
+
+    @callback
+    def _update_next_change(self):
+        """Look up the next change in the cached profile, and wait for it to pass."""
+        self._cancel_next_change_listener()
+        device = self.data
+        self._next_change = None if device is None else self._coordinator.next_scheduled_change(device)
+        if self._next_change is not None:
+            self._remove_next_change_listener = async_track_point_in_time(
+                self.hass, self._async_next_change_passed, self._next_change.time
+            )
+
+    @callback
+    def _async_next_change_passed(self, now):
+        """Move on to the change after, without asking the hub."""
+        self._remove_next_change_listener = None
+        self._update_next_change()
+        self.async_write_ha_state()
+
+    @callback
+    def _cancel_next_change_listener(self):
+        if self._remove_next_change_listener is not None:
+            self._remove_next_change_listener()
+            self._remove_next_change_listener = None
 
     @property
     def extra_state_attributes(self):
         """Return the additional state attributes."""
         attributes = {
-            'device_id': self._neosensor.device_id,
-            'device_type': self._neosensor.device_type,
-            'low_battery': self.data.low_battery,
-            'offline': self.data.offline
+            'device_id': self._neostat.device_id,
+            'device_type': self._neostat.device_type,
+            'active_profile': self.data.active_profile
         }
         return attributes
 
-    @property
-    def icon(self):
-        if self.data.offline:
-            return "mdi:thermometer-alert"
-        return "mdi:thermometer-auto"
-
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return f"{self._neosensor.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neosensor.device_type]} Temperature"
-
-    @property
-    def native_unit_of_measurement(self):
-        """Return the unit of measurement."""
-        if self.data.offline:
-            return None
-        elif self._unit_of_measurement == "C":
-            return "°C"
-        elif self._unit_of_measurement == "F":
-            return "°F"
-        else:
-            return None
-
     @property
     def native_value(self):
-        """Return the sensors temperature value."""
-        if self.data.offline:
+        """Return the state of the sensor, taken from the next change."""
+        if self._next_change is None:
             return None
-        return float(self.data.temperature)
-
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neosensor.name}_{self._coordinator.serial_number}_{self._neosensor.serial_number}_heatmiser_neo_temperature_sensor"
-
-
-class HeatmiserNeoTimerOutputActiveSensor(CoordinatorEntity, BinarySensorEntity):
-    """Represents a Heatmiser Neostat Timer Output Active binary sensor"""
-
-    def __init__(self, neostat: NeoStat, coordinator: DataUpdateCoordinator):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for Device ID: {neostat.device_id} Name: {neostat.name}")
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        thermostats = {device.name: device for device in devices['neo_devices']}
-        return thermostats[self._neostat.name]
-
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return f"{self._neostat.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neostat.device_type]} Timer Output Active"
-
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neo_device_timer_output_active"
-
-    @property
-    def is_on(self):
-        """Return true if the binary sensor is on. i.e. Neo Device is timer output is active"""
-        return bool(self.data.timer_on)
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "model": f"{HEATMISER_PRODUCT_LIST[self._neostat.device_type]}",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "sw_version": self._neostat.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
-
+        return self.entity_description.value_fn(self._next_change)
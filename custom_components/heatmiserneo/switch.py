@@ -6,7 +6,7 @@ homeassistant.components.switch.heatmiserneo
 
 """
 
-from datetime import time
+from datetime import time, timedelta
 from enum import IntFlag
 import logging
 
@@ -15,13 +15,9 @@ from homeassistant.const import EntityCategory
 from homeassistant.components.switch import SwitchEntity, SwitchDeviceClass
 from homeassistant.helpers import entity_platform
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-)
 
-from neohubapi.neohub import NeoHub, NeoStat
-from .const import COORDINATOR, DOMAIN, HUB, HEATMISER_PRODUCT_LIST
+from .entity import HeatmiserNeoEntity
+from .const import COORDINATOR, DOMAIN, HUB, HEATMISER_PRODUCT_LIST, DeviceCapability
 from .const import (
     ATTR_HOLD_DURATION,
     SERVICE_TIMER_HOLD_ON,
@@ -43,13 +39,13 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
     devices_data, _ = coordinator.data
 
-    neo_devices = {device.name: device for device in devices_data["neo_devices"]}
+    neo_devices = devices_data["neo_devices_by_name"]
     _LOGGER.info(f"neo_devices: {neo_devices}")
     list_of_neo_devices = []
     for neo_device in neo_devices.values():
         # Only Heatmiser Neo Plugs support manual switching and disabling timers.
         if DEVICES_ENABLED_NEO_PLUG:
-            if neo_device.device_type == 6:
+            if DeviceCapability.PLUG in neo_device.capabilities:
                 list_of_neo_devices.append(HeatmiserNeoPlugPowerSwitch(neo_device, coordinator, hub))
                 list_of_neo_devices.append(HeatmiserNeoPlugTimerSwitch(neo_device, coordinator, hub))
                 # TODO: Restore Timer switch goes here as config option.
@@ -60,7 +56,7 @@ async def async_setup_entry(hass, entry, async_add_entities):
             # Thermostats (In Thermostat / Timeclock mode) and NeoPlugs all allow for holding.
 
             # Neo plugs and Thermostats in Time Clock mode
-            if (neo_device.device_type in [1, 2, 7, 12, 13]) and neo_device.time_clock_mode:
+            if DeviceCapability.TIMECLOCK in neo_device.capabilities and neo_device.time_clock_mode:
                 # Switch to control standby mode
                 list_of_neo_devices.append(NeoTimerEntity(neo_device, coordinator, hub))
                 list_of_neo_devices.append(HeatmiserTimerDeviceStandbySwitch(neo_device, coordinator, hub))
@@ -87,7 +83,7 @@ class HeatmiseerNeoSwitchEntityFeature(IntFlag):
     HOLD = 1
 
 
-class HeatmiserNeoPlugPowerSwitch(CoordinatorEntity, SwitchEntity):
+class HeatmiserNeoPlugPowerSwitch(HeatmiserNeoEntity, SwitchEntity):
     """Represents a Heatmiser Neo Plug"""
 
     """Handles:
@@ -95,52 +91,12 @@ class HeatmiserNeoPlugPowerSwitch(CoordinatorEntity, SwitchEntity):
     {"TIMER_OFF":"plug"} TIMER_OFF turns the output off
     """
 
-    def __init__(
-            self,
-            neostat: NeoStat,
-            coordinator: DataUpdateCoordinator,
-            hub: NeoHub
-    ):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for {neostat.name} {neostat.device_id}")
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-        self._hub = hub
-        self._state = neostat.timer_on
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        neo_devices = {device.name: device for device in devices["neo_devices"]}
-        return neo_devices[self._neostat.name]
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        else:
-            return True
+    _unique_id_suffix = "heatmiser_neo_plug"
 
     @property
     def device_class(self):
         return SwitchDeviceClass.OUTLET
 
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "model": f"{HEATMISER_PRODUCT_LIST[self.data.device_type]}",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "sw_version": self.data.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
-
     @property
     def extra_state_attributes(self):
         """Return the additional state attributes."""
@@ -156,11 +112,6 @@ class HeatmiserNeoPlugPowerSwitch(CoordinatorEntity, SwitchEntity):
         """Return the name of the sensor."""
         return f"{self._neostat.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neostat.device_type]}"
 
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
     @property
     def state(self):
         """Return the entity state."""
@@ -170,37 +121,48 @@ class HeatmiserNeoPlugPowerSwitch(CoordinatorEntity, SwitchEntity):
     async def async_turn_on(self, **kwargs):
         """ Turn the switch on. """
         _LOGGER.info(f"{self.name} : Executing turn_on() with: {kwargs}")
-
-        # Clear all hold timers, we're going into manual mode.
-        await self._hub.set_timer_hold(True, 0, [self._neostat])
-        await self._hub.set_timer_hold(False, 0, [self._neostat])
-
-        # We need to disable the TimeClock as we're going manual
-        #
-        # {“MANUAL_ON”:<devices>} Disables the timeclock built into the neoplug
-
-        await self._hub.set_manual(False, [self._neostat])
-        await self._hub.set_timer(True, [self._neostat])
+        await self._async_set_power(True)
 
     async def async_turn_off(self, **kwargs):
         """ Turn the switch off. """
         _LOGGER.info(f"{self.name} : Executing turn_off() with: {kwargs}")
-
-        # Clear all hold timers, we're going into manual mode.
-        await self._hub.set_timer_hold(True, 0, [self._neostat])
-        await self._hub.set_timer_hold(False, 0, [self._neostat])
-        await self._hub.set_timer(False, [self._neostat])
         # TODO: Should we Reinstates the timeclock built into the Neoplug based on configuration switch.
-        # await self._hub.set_manual(True, [self._neostat])
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neo_plug"
+        await self._async_set_power(False)
+
+    async def _async_set_power(self, state):
+        """Switch the plug, showing the new state straight away and putting the old one back if the hub fails."""
+        previous = self.data
+
+        # Optimistically update the state so that the UI feels snappy.
+        # The value will be confirmed next time we get new data.
+        changes = {"timer_on": state, "hold_on": False}
+        if state:
+            changes["manual_off"] = True
+        patched = self._coordinator.async_patch_device(previous.device_id, **changes)
+
+        try:
+            result = await self._hub.set_plug_power(state, [previous])
+        except Exception:
+            self._restore_state(previous, patched)
+            raise
+
+        if not result:
+            _LOGGER.error(f"{self.name} : The hub did not confirm switching {'on' if state else 'off'}")
+            self._restore_state(previous, patched)
+
+    def _restore_state(self, previous, patched):
+        """Put back the state from before the command, unless a refresh has replaced the optimistic one since."""
+        if self.data is not patched:
+            # The hub's data is newer than the state from before the command, so ask it again rather than guess.
+            self.hass.async_create_task(self._coordinator.async_request_refresh())
+            return
+
+        self._coordinator.async_patch_device(
+            previous.device_id, timer_on=previous.timer_on, hold_on=previous.hold_on, manual_off=previous.manual_off
+        )
 
 
-class HeatmiserNeoPlugTimerSwitch(CoordinatorEntity, SwitchEntity):
+class HeatmiserNeoPlugTimerSwitch(HeatmiserNeoEntity, SwitchEntity):
     """Represents a switch to control a Heatmiser Neo Plug's Time Clock function."""
 
     """
@@ -209,51 +171,12 @@ class HeatmiserNeoPlugTimerSwitch(CoordinatorEntity, SwitchEntity):
     {“MANUAL_OFF”:<devices>} Reinstates the timeclock built into the Neoplug
     """
 
-    def __init__(
-            self,
-            neostat: NeoStat,
-            coordinator: DataUpdateCoordinator,
-            hub: NeoHub
-    ):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for {neostat.name} {neostat.device_id}")
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-        self._hub = hub
-
-    @property
-    def data(self):
-        """Helper to get the data for the current Heatmiser Neo device."""
-        (devices, _) = self._coordinator.data
-        neo_devices = {device.name: device for device in devices["neo_devices"]}
-        return neo_devices[self._neostat.name]
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        else:
-            return True
+    _unique_id_suffix = "heatmiser_neo_plug_timer_switch"
 
     @property
     def device_class(self):
         return SwitchDeviceClass.SWITCH
 
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "model": f"{HEATMISER_PRODUCT_LIST[self.data.device_type]}",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "sw_version": self.data.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
-
     @property
     def extra_state_attributes(self):
         """Return the additional state attributes."""
@@ -266,7 +189,10 @@ class HeatmiserNeoPlugTimerSwitch(CoordinatorEntity, SwitchEntity):
 
     @property
     def icon(self):
-        if self.data.manual_off:
+        if self.data is None:
+            return "mdi:timer-alert-outline"
+
+        elif self.data.manual_off:
             return "mdi:timer-off"
 
         elif not self.data.manual_off:
@@ -285,11 +211,6 @@ class HeatmiserNeoPlugTimerSwitch(CoordinatorEntity, SwitchEntity):
         """Return the name of the sensor."""
         return f"{self._neostat.name} Heatmiser Neo Timer Enabled"
 
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
     async def async_turn_on(self, **kwargs):
         """ Turn the switch on. """
         _LOGGER.info(f"{self.name} : Executing turn_on() with: {kwargs}")
@@ -300,62 +221,16 @@ class HeatmiserNeoPlugTimerSwitch(CoordinatorEntity, SwitchEntity):
         _LOGGER.info(f"{self.name} : Executing turn_off() with: {kwargs}")
         response = await self._hub.set_manual(True, [self._neostat])
 
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neo_plug_timer_switch"
-
 
-class HeatmiserTimerDeviceStandbySwitch(CoordinatorEntity, SwitchEntity):
+class HeatmiserTimerDeviceStandbySwitch(HeatmiserNeoEntity, SwitchEntity):
     """Represents a Heatmiser Neostat Timer Device Standby Switch"""
 
-    def __init__(
-            self,
-            neostat: NeoStat,
-            coordinator: DataUpdateCoordinator,
-            hub: NeoHub
-    ):
-        super().__init__(coordinator)
-        _LOGGER.debug(f"Creating {type(self).__name__} for {neostat.name} {neostat.device_id}")
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-        self._hub = hub
-        self._neostat.standby = neostat.standby
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        neo_devices = {device.name: device for device in devices["neo_devices"]}
-        return neo_devices[self._neostat.name]
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        else:
-            return True
+    _unique_id_suffix = "heatmiser_neo_timer_device_standby_switch"
 
     @property
     def device_class(self):
         return SwitchDeviceClass.SWITCH
 
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, f"{self._coordinator.serial_number}_{self._neostat.serial_number}")},
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "model": f"{HEATMISER_PRODUCT_LIST[self.data.device_type]}",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "sw_version": self.data.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
-
     @property
     def extra_state_attributes(self):
         """Return the additional state attributes."""
@@ -368,7 +243,7 @@ class HeatmiserTimerDeviceStandbySwitch(CoordinatorEntity, SwitchEntity):
 
     @property
     def icon(self):
-        if self.data.offline:
+        if self.data is None or self.data.offline:
             return "mdi:network-off-outline"
 
         elif self.data.standby:
@@ -390,85 +265,30 @@ class HeatmiserTimerDeviceStandbySwitch(CoordinatorEntity, SwitchEntity):
         """Return the name of the sensor."""
         return f"{self._neostat.name} Heatmiser {HEATMISER_PRODUCT_LIST[self._neostat.device_type]} Standby"
 
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neo_timer_device_standby_switch"
-        
     async def async_turn_on(self, **kwargs):
         """ Turn on Standby (Previously Frost) mode. """
-        response = await self._neostat.set_frost(True)
+        response = await self._hub.set_frost(True, [self.data])
         _LOGGER.info(f"{self.name} : Called set_frost with: True (response: {response})")
-        self.data.standby = True
-        self.async_write_ha_state()
+        self._coordinator.async_patch_device(self.data.device_id, standby=True)
 
     async def async_turn_off(self, **kwargs):
         """ Turn off Standby (Previously Frost) mode. """
-        response = await self._neostat.set_frost(False)
+        response = await self._hub.set_frost(False, [self.data])
         _LOGGER.info(f"{self.name} : Called set_frost with: False (response: {response})")
-        self.data.standby = False
-        self.async_write_ha_state()
+        self._coordinator.async_patch_device(self.data.device_id, standby=False)
 
 
-class NeoTimerEntity(CoordinatorEntity, SwitchEntity):
+class NeoTimerEntity(HeatmiserNeoEntity, SwitchEntity):
     """Represents a Heatmiser neoStat thermostat acting in TimeClock mode."""
 
-    _attr_supported_features = HeatmiseerNeoSwitchEntityFeature.HOLD
+    _unique_id_suffix = "heatmiser_neotimer"
 
-    def __init__(
-        self, neostat: NeoStat, coordinator: DataUpdateCoordinator, hub: NeoHub
-    ):
-        super().__init__(coordinator)
-        _LOGGER.debug(
-            f"Creating {type(self).__name__} for {neostat.name} {neostat.device_id}"
-        )
-
-        self._neostat = neostat
-        self._coordinator = coordinator
-        self._hub = hub
-
-    @property
-    def data(self):
-        """Helper to get the data for the current thermostat."""
-        (devices, _) = self._coordinator.data
-        neo_devices = {device.name: device for device in devices["neo_devices"]}
-        return neo_devices[self._neostat.name]
-
-    @property
-    def available(self):
-        """Return true if the entity is available."""
-        if self.data.offline:
-            return False
-        return True
+    _attr_supported_features = HeatmiseerNeoSwitchEntityFeature.HOLD
 
     @property
     def device_class(self):
         return SwitchDeviceClass.SWITCH
 
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {
-                (
-                    DOMAIN,
-                    f"{self._coordinator.serial_number}_{self._neostat.serial_number}",
-                )
-            },
-            "name": self._neostat.name,
-            "manufacturer": "Heatmiser",
-            "model": f"{HEATMISER_PRODUCT_LIST[self.data.device_type]}",
-            "serial_number": self._neostat.serial_number,
-            "suggested_area": self._neostat.name,
-            "sw_version": self.data.stat_version,
-            "via_device": (DOMAIN, self._coordinator.serial_number),
-        }
-
     @property
     def extra_state_attributes(self):
         """Return the additional state attributes."""
@@ -477,7 +297,7 @@ class NeoTimerEntity(CoordinatorEntity, SwitchEntity):
             "device_type": self._neostat.device_type,
             "offline": self.data.offline,
             "hold_on": self.data.hold_on,
-            "hold_time": ":".join(str(self.data.hold_time).split(":")[:2]),
+            "hold_time": self.data.hold_time_text,
         }
 
     @property
@@ -503,11 +323,12 @@ class NeoTimerEntity(CoordinatorEntity, SwitchEntity):
         )
         result = await self._hub.set_timer_hold(True, hold_minutes, [self._neostat])
 
-        hold_hours, remainder = divmod(hold_minutes, 60)
-        self.data.timer_on = hold_minutes > 0
-        self.data.hold_on = hold_minutes > 0
-        self.data.hold_time = str(f"{hold_hours!s}:{str(remainder).ljust(2, '0')}")
-        self.async_schedule_update_ha_state(False)
+        self._coordinator.async_patch_device(
+            self.data.device_id,
+            timer_on=hold_minutes > 0,
+            hold_on=hold_minutes > 0,
+            hold_time=timedelta(minutes=hold_minutes),
+        )
         return result
 
     async def async_turn_off(self, **kwargs):
@@ -517,19 +338,7 @@ class NeoTimerEntity(CoordinatorEntity, SwitchEntity):
             f"Device Unique ID: {self.unique_id} - {self._neostat.name}: Executing turn_off()"
         )
         result = await self._hub.set_timer_hold(False, 0, [self._neostat])
-        self.data.timer_on = False
-        self.data.hold_on = False
-        self.data.hold_time = "0:00"
-        self.async_schedule_update_ha_state(False)
+        self._coordinator.async_patch_device(
+            self.data.device_id, timer_on=False, hold_on=False, hold_time=timedelta(0)
+        )
         return result
-
-    @property
-    def should_poll(self):
-        """Don't poll - we fetch the data from the hub all at once"""
-        return False
-
-    @property
-    def unique_id(self):
-        """Return a unique ID"""
-        # Use both the Hub and Device serial numbers as you can have orphaned devices still present in hub configuration.
-        return f"{self._neostat.name}_{self._coordinator.serial_number}_{self._neostat.serial_number}_heatmiser_neotimer"
@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Fixtures that run the integration in Home Assistant against a fake NeoHub."""
+
+import os
+
+import pytest
+from homeassistant import config_entries, loader
+from homeassistant.const import CONF_API_TOKEN, CONF_HOST, CONF_PORT
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity,
+    entity_platform,
+    entity_registry as er,
+    restore_state,
+    translation,
+)
+
+from custom_components.heatmiserneo.const import COORDINATOR, DOMAIN, HUB
+
+from .fake_hub import FakeNeoHub
+
+CUSTOM_COMPONENTS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "custom_components")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="run the benchmarks, use with -s to see their results")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the benchmarks unless asked for, their timings depend on how busy the machine is."""
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --benchmark")
+    for item in items:
+        if item.get_closest_marker("benchmark"):
+            item.add_marker(skip)
+
+
+@pytest.fixture
+async def fake_hub():
+    """A fake NeoHub with five zones."""
+    hub = FakeNeoHub()
+    await hub.start()
+    yield hub
+    await hub.stop()
+
+
+@pytest.fixture
+async def hass(tmp_path):
+    """A running Home Assistant that loads the integration from this repository."""
+    os.symlink(CUSTOM_COMPONENTS, tmp_path / "custom_components")
+    hass = HomeAssistant(str(tmp_path))
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    translation.async_setup(hass)
+    entity.async_setup(hass)
+    await restore_state.async_load(hass)
+    await ar.async_load(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    await hass.async_start()
+
+    yield hass
+
+    await hass.async_stop(force=True)
+
+
+async def async_add_hub(hass, fake_hub, websocket=False):
+    """Add a config entry for a fake hub and wait for it to be set up, returns the entry."""
+    port = 4243 if websocket else 4242
+    entry = config_entries.ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title=f"{fake_hub.host}:{port}",
+        data={CONF_HOST: fake_hub.host, CONF_PORT: port, CONF_API_TOKEN: fake_hub.token if websocket else ""},
+        source=config_entries.SOURCE_USER,
+        options={},
+        unique_id=f"{fake_hub.host}:{port}",
+    )
+    await hass.config_entries.async_add(entry)
+    await hass.async_block_till_done()
+    assert entry.state is config_entries.ConfigEntryState.LOADED
+    return entry
+
+
+def entry_coordinator(hass, entry):
+    """Return the coordinator of a config entry."""
+    return hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+
+
+def entry_hub(hass, entry):
+    """Return the hub client of a config entry."""
+    return hass.data[DOMAIN][entry.entry_id][HUB]
+
+
+def integration_entities(hass):
+    """Return every entity the integration has added."""
+    return [
+        entity for platform in entity_platform.async_get_platforms(hass, DOMAIN) for entity in platform.entities.values()
+    ]
@@ -0,0 +1,318 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""
+A NeoHub on localhost for the tests.
+
+It answers the legacy API on port 4242 and the token authenticated WebSocket API on port 4243 the way a hub does, from
+a list of zones kept in the form of the hub's GET_LIVE_DATA reply. Every message is recorded, so the tests can check what
+the integration asked the hub for.
+
+neohubapi only accepts the hub's own port numbers, so each fake hub listens on a loopback address of its own instead.
+"""
+
+import ast
+import asyncio
+import copy
+import datetime
+import functools
+import itertools
+import json
+import ssl
+import tempfile
+from pathlib import Path
+
+import websockets
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+HUB_SYSTEM = {
+    "ALT_TIMER_FORMAT": 4,
+    "CORF": "C",
+    "DEVICE_ID": "NeoHub",
+    "FORMAT": 2,
+    "HUB_TYPE": 2,
+    "HUB_VERSION": 2150,
+    "NTP_ON": "Running",
+    "TIMEZONESTR": "Europe/London",
+}
+
+# Replies to the commands the fake hub accepts, as neohubapi expects them.
+COMMAND_REPLIES = {
+    "FROST_OFF": {"result": "frost off"},
+    "FROST_ON": {"result": "frost on"},
+    "HOLD": {"result": "temperature on hold"},
+    "IDENTIFY_DEV": {"result": "Device identifying"},
+    "MANUAL_OFF": {"result": "manual off"},
+    "MANUAL_ON": {"result": "manual on"},
+    "NTP_ON": {"result": "ntp client started"},
+    "SET_COOL_TEMP": {"result": "temperature was set"},
+    # The wording of this reply isn't documented, the integration doesn't check it.
+    "SET_FAN_SPEED": {"result": "fan speed was set"},
+    "SET_HC_MODE": {"result": "HC_MODE was set"},
+    "SET_TEMP": {"result": "temperature was set"},
+    "TIMER_HOLD_OFF": {"result": "timer hold off"},
+    "TIMER_HOLD_ON": {"result": "timer hold on"},
+    "TIMER_OFF": {"result": "timers off"},
+    "TIMER_ON": {"result": "timers on"},
+}
+
+# Sent instead of the reply to the commands in FakeNeoHub.garbled, as a hub that is busy restarting can.
+GARBLED_REPLY = '{"result": '
+
+_hosts = (f"127.0.0.{number}" for number in itertools.cycle(range(2, 255)))
+
+
+@functools.cache
+def _server_ssl_context():
+    """Return a TLS context with a self signed certificate, as the hub uses one for its WebSocket API."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "NeoHub")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    with tempfile.TemporaryDirectory() as directory:
+        certificate_file = Path(directory, "hub.pem")
+        key_file = Path(directory, "hub.key")
+        certificate_file.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+        key_file.write_bytes(
+            key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+            )
+        )
+        context.load_cert_chain(certificate_file, key_file)
+    return context
+
+
+def zone_data(device_id, name=None, device_type=12, **changes):
+    """Return the live data of a zone, as the hub reports a NeoStat by default."""
+    zone = {
+        "ACTIVE_LEVEL": 0,
+        "ACTIVE_PROFILE": 0,
+        "ACTUAL_TEMP": "20.5",
+        "AVAILABLE_MODES": ["heat"],
+        "AWAY": False,
+        "COOL_ON": False,
+        "COOL_TEMP": 0,
+        "CURRENT_FLOOR_TEMPERATURE": 127,
+        "DATE": "monday",
+        "DEVICE_ID": device_id,
+        "FAN_CONTROL": "Manual",
+        "FAN_SPEED": "Off",
+        "FLOOR_LIMIT": False,
+        "HC_MODE": "HEATING",
+        "HEAT_MODE": True,
+        "HEAT_ON": False,
+        "HOLD_COOL": 0,
+        "HOLD_OFF": False,
+        "HOLD_ON": False,
+        "HOLD_TEMP": 20,
+        "HOLD_TIME": "0:00",
+        "HOLIDAY": False,
+        "LOCK": False,
+        "LOW_BATTERY": False,
+        "MANUAL_OFF": False,
+        "MODELOCK": False,
+        "MODULATION_LEVEL": 0,
+        "OFFLINE": False,
+        "PIN_NUMBER": "0000",
+        "PREHEAT_ACTIVE": False,
+        "PRG_TEMP": 0,
+        "PRG_TIMER": False,
+        "SET_TEMP": "21",
+        "STANDBY": False,
+        "STAT_VERSION": 3,
+        "SWITCH_DELAY_LEFT": "00:00",
+        "TEMPORARY_SET_FLAG": False,
+        "THERMOSTAT": True,
+        "TIME": "12:30",
+        "TIMER_ON": False,
+        "WINDOW_OPEN": False,
+        "WRITE_COUNT": 5,
+        "ZONE_NAME": name or f"Zone {device_id}",
+    }
+    zone.update(changes)
+    # Only in the engineers data, the fake hub splits it back out.
+    zone["DEVICE_TYPE"] = device_type
+    return zone
+
+
+class FakeNeoHub:
+    """A NeoHub with a number of NeoStat zones, serving both of the hub's APIs."""
+
+    def __init__(self, zones=5, token="fake-token"):
+        self.token = token
+        self.zones = [zone_data(device_id) for device_id in range(1, zones + 1)]
+        # Changes to it are reported once TIMESTAMP_SYSTEM is moved, see change_system().
+        self.system = copy.deepcopy(HUB_SYSTEM)
+        self.timestamps = {
+            "TIMESTAMP_DEVICE_LISTS": 1,
+            "TIMESTAMP_ENGINEERS": 1,
+            "TIMESTAMP_PROFILE_0": 1,
+            "TIMESTAMP_PROFILE_COMFORT_LEVELS": 1,
+            "TIMESTAMP_PROFILE_TIMERS": 1,
+            "TIMESTAMP_PROFILE_TIMERS_0": 1,
+            "TIMESTAMP_RECIPES": 1,
+            "TIMESTAMP_SYSTEM": 1,
+        }
+        # Every message received, in order, e.g. {"GET_LIVE_DATA": 0}.
+        self.messages = []
+        # Connections opened to each API.
+        self.connections = {"legacy": 0, "websocket": 0}
+        # Seconds the hub takes to answer a message.
+        self.reply_delay = 0
+        # Commands that are answered with something that isn't JSON.
+        self.garbled = set()
+        # The levels of the zones that have their own profile, by zone name, in the form of GET_PROFILE_0's info.
+        self.zone_profiles = {}
+        self.host = next(_hosts)
+        self._servers = []
+        # The WebSocket connections that are open now.
+        self.open_websockets = set()
+
+    async def start(self):
+        """Start listening on the hub's loopback address."""
+        self._servers.append(await asyncio.start_server(self._handle_legacy_connection, self.host, 4242))
+        self._servers.append(
+            await websockets.serve(self._handle_websocket, self.host, 4243, ssl=_server_ssl_context())
+        )
+
+    async def stop(self):
+        """Stop listening."""
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+    async def disconnect(self):
+        """Close the open WebSocket connections, as the hub does when it restarts."""
+        for websocket in list(self.open_websockets):
+            await websocket.close()
+
+    def received(self, command):
+        """Return the messages received for a command, e.g. received("SET_TEMP")."""
+        return [message for message in self.messages if command in message]
+
+    def add_zone(self, device_id, **changes):
+        """Add a zone, moving the device list's change marker as the hub does."""
+        self.zones.append(zone_data(device_id, **changes))
+        self.timestamps["TIMESTAMP_DEVICE_LISTS"] += 1
+        self.timestamps["TIMESTAMP_ENGINEERS"] += 1
+
+    def change_system(self, **changes):
+        """Change the system data, moving its change marker as the hub does."""
+        self.system.update(changes)
+        self.timestamps["TIMESTAMP_SYSTEM"] += 1
+
+    def zone(self, name):
+        """Return the live data of a zone by name, changes to it are reported on the next GET_LIVE_DATA."""
+        return next(zone for zone in self.zones if zone["ZONE_NAME"] == name)
+
+    async def _handle_legacy_connection(self, reader, writer):
+        """Answer one message and close the connection, as the hub does on its legacy port."""
+        self.connections["legacy"] += 1
+        try:
+            data = await reader.readuntil(b"\0")
+            await asyncio.sleep(self.reply_delay)
+            reply = self.answer(json.loads(data.rstrip(b"\0")))
+            writer.write(self._encode(reply).encode() + b"\0")
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _handle_websocket(self, websocket, *_):
+        """Answer messages until the client goes, the connection is closed on a wrong token as the hub does."""
+        self.connections["websocket"] += 1
+        self.open_websockets.add(websocket)
+        try:
+            async for data in websocket:
+                request = json.loads(json.loads(data)["message"])
+                if request["token"] != self.token:
+                    await websocket.close(1002)
+                    return
+
+                # neohubapi sends the command as a Python literal, e.g. "{'GET_LIVE_DATA': 0}".
+                (command,) = request["COMMANDS"]
+                await asyncio.sleep(self.reply_delay)
+                reply = self.answer(ast.literal_eval(command["COMMAND"]))
+                await websocket.send(json.dumps({
+                    "command_id": command["COMMANDID"],
+                    "device_id": "NeoHub",
+                    "message_type": "hm_set_command_response",
+                    "response": self._encode(reply),
+                }))
+        finally:
+            self.open_websockets.discard(websocket)
+
+    @staticmethod
+    def _encode(reply):
+        return reply if reply is GARBLED_REPLY else json.dumps(reply)
+
+    def answer(self, message):
+        """Return the hub's reply to a message."""
+        self.messages.append(message)
+        ((command, value),) = message.items()
+
+        if command in self.garbled:
+            return GARBLED_REPLY
+        if command == "GET_LIVE_DATA":
+            devices = [{key: value for key, value in zone.items() if key != "DEVICE_TYPE"} for zone in self.zones]
+            return {**self.timestamps, "HUB_TIME": 1700000000, "devices": devices}
+        if command == "GET_SYSTEM":
+            return copy.deepcopy(self.system)
+        if command == "GET_ENGINEERS":
+            return {
+                zone["ZONE_NAME"]: {"DEVICE_ID": zone["DEVICE_ID"], "DEVICE_TYPE": zone["DEVICE_TYPE"], "FLOOR_LIMIT": 28}
+                for zone in self.zones
+            }
+        if command == "DEVICES_SN":
+            return {zone["ZONE_NAME"]: [zone["DEVICE_ID"], self.serial_number(zone), 1] for zone in self.zones}
+        if command == "FIRMWARE":
+            return {"HUB_VERSION": self.system["HUB_VERSION"], "firmware version": str(self.system["HUB_VERSION"])}
+        if command == "GET_PROFILES":
+            return {}
+        if command == "GET_PROFILE_0":
+            return {"PROFILE_ID": 0, "info": self.zone_profiles.get(value, {}), "name": value}
+        if command in COMMAND_REPLIES:
+            self._apply_command(command, value)
+            return COMMAND_REPLIES[command]
+        return {"error": f"Unknown command {command}"}
+
+    @staticmethod
+    def serial_number(zone):
+        """Return the serial number the hub reports for a zone."""
+        return f"SN{zone['DEVICE_ID']:06d}"
+
+    def _apply_command(self, command, value):
+        """Change the zones a command is for, for the commands whose effect the tests look at."""
+        if command == "NTP_ON":
+            self.change_system(NTP_ON="Running")
+            return
+        names = value[-1] if command in ("SET_COOL_TEMP", "SET_FAN_SPEED", "SET_HC_MODE", "SET_TEMP") else value
+        if not isinstance(names, list):
+            names = [names]
+        for zone in self.zones:
+            if zone["ZONE_NAME"] not in names:
+                continue
+            if command == "SET_TEMP":
+                zone["SET_TEMP"] = str(value[0])
+            elif command == "SET_COOL_TEMP":
+                zone["COOL_TEMP"] = value[0]
+            elif command == "SET_HC_MODE":
+                zone["HC_MODE"] = value[0]
+            elif command == "SET_FAN_SPEED":
+                zone["FAN_CONTROL"] = "Automatic" if value[0] == "AUTO" else "Manual"
+                zone["FAN_SPEED"] = value[0].capitalize()
+            elif command in ("FROST_ON", "FROST_OFF"):
+                zone["STANDBY"] = command == "FROST_ON"
@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for the thermostats, in particular the heating and cooling (HC) ones."""
+
+import pytest
+from homeassistant.components.climate import ClimateEntityFeature, HVACMode
+from homeassistant.exceptions import ServiceValidationError
+
+from .conftest import async_add_hub
+
+HC_THERMOSTAT = "climate.zone_6"
+
+
+async def _add_hub_with_hc_thermostat(hass, fake_hub, hc_mode="COOLING", fan=True):
+    """Add the hub with a NeoStat HC as Zone 6, cooling to 24 and heating to 21 unless told otherwise."""
+    fake_hub.add_zone(
+        6, device_type=11, AVAILABLE_MODES=["heat", "cool", "auto", "vent"], HC_MODE=hc_mode, COOL_TEMP=24
+    )
+    if not fan:
+        # Not every HC thermostat has a fan attached.
+        del fake_hub.zone("Zone 6")["FAN_CONTROL"]
+        del fake_hub.zone("Zone 6")["FAN_SPEED"]
+    return await async_add_hub(hass, fake_hub)
+
+
+async def _async_set_temperature(hass, **data):
+    await hass.services.async_call("climate", "set_temperature", {"entity_id": HC_THERMOSTAT, **data}, blocking=True)
+
+
+async def test_cooling_target_temperature(hass, fake_hub):
+    """While cooling, the single target temperature is the cooling one, and setting it sets the cooling one."""
+    await _add_hub_with_hc_thermostat(hass, fake_hub)
+    state = hass.states.get(HC_THERMOSTAT)
+    assert state.state == HVACMode.COOL
+    assert state.attributes["hvac_modes"] == [
+        HVACMode.OFF, HVACMode.HEAT, HVACMode.COOL, HVACMode.FAN_ONLY, HVACMode.HEAT_COOL
+    ]
+    assert state.attributes["temperature"] == 24
+
+    await _async_set_temperature(hass, temperature=22)
+
+    ((temperature, names),) = [message["SET_COOL_TEMP"] for message in fake_hub.received("SET_COOL_TEMP")]
+    assert (float(temperature), names) == (22, ["Zone 6"])
+    assert fake_hub.received("SET_TEMP") == []
+    assert hass.states.get(HC_THERMOSTAT).attributes["temperature"] == 22
+
+
+async def test_heating_target_temperature(hass, fake_hub):
+    """While heating, the single target temperature is the heating one."""
+    await _add_hub_with_hc_thermostat(hass, fake_hub, hc_mode="HEATING")
+    assert hass.states.get(HC_THERMOSTAT).attributes["temperature"] == 21
+
+    await _async_set_temperature(hass, temperature=19)
+
+    assert len(fake_hub.received("SET_TEMP")) == 1
+    assert fake_hub.received("SET_COOL_TEMP") == []
+    assert hass.states.get(HC_THERMOSTAT).attributes["temperature"] == 19
+
+
+async def test_target_temperature_range(hass, fake_hub):
+    """In auto, both temperatures are set, and only the ones that change are sent."""
+    await _add_hub_with_hc_thermostat(hass, fake_hub, hc_mode="AUTO")
+
+    await _async_set_temperature(hass, target_temp_low=21, target_temp_high=26)
+
+    assert fake_hub.received("SET_TEMP") == []
+    assert len(fake_hub.received("SET_COOL_TEMP")) == 1
+    state = hass.states.get(HC_THERMOSTAT)
+    assert (state.attributes["target_temp_low"], state.attributes["target_temp_high"]) == (21, 26)
+
+
+async def test_set_hvac_mode(hass, fake_hub):
+    """Changing mode sets the HC mode, and the change is shown straight away."""
+    await _add_hub_with_hc_thermostat(hass, fake_hub)
+
+    await hass.services.async_call(
+        "climate", "set_hvac_mode", {"entity_id": HC_THERMOSTAT, "hvac_mode": HVACMode.HEAT}, blocking=True
+    )
+
+    assert fake_hub.received("SET_HC_MODE") == [{"SET_HC_MODE": ["HEATING", ["Zone 6"]]}]
+    assert hass.states.get(HC_THERMOSTAT).state == HVACMode.HEAT
+    assert hass.states.get(HC_THERMOSTAT).attributes["temperature"] == 21
+
+
+async def test_fan_mode(hass, fake_hub):
+    """An HC thermostat with a fan has fan modes, an unknown one is rejected without asking the hub."""
+    await _add_hub_with_hc_thermostat(hass, fake_hub)
+    state = hass.states.get(HC_THERMOSTAT)
+    assert state.attributes["supported_features"] & ClimateEntityFeature.FAN_MODE
+    assert state.attributes["fan_modes"] == ["auto", "low", "medium", "high"]
+
+    await hass.services.async_call(
+        "climate", "set_fan_mode", {"entity_id": HC_THERMOSTAT, "fan_mode": "low"}, blocking=True
+    )
+    assert fake_hub.received("SET_FAN_SPEED") == [{"SET_FAN_SPEED": ["LOW", ["Zone 6"]]}]
+    assert hass.states.get(HC_THERMOSTAT).attributes["fan_mode"] == "low"
+
+    with pytest.raises(ServiceValidationError):
+        await hass.services.async_call(
+            "climate", "set_fan_mode", {"entity_id": HC_THERMOSTAT, "fan_mode": "turbo"}, blocking=True
+        )
+    assert len(fake_hub.received("SET_FAN_SPEED")) == 1
+
+
+async def test_no_fan_mode_without_a_fan(hass, fake_hub):
+    """An HC thermostat that doesn't report a fan has no fan modes."""
+    await _add_hub_with_hc_thermostat(hass, fake_hub, fan=False)
+    state = hass.states.get(HC_THERMOSTAT)
+
+    assert not state.attributes["supported_features"] & ClimateEntityFeature.FAN_MODE
+    assert "fan_modes" not in state.attributes
@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for merging the same command for different zones into one message to the hub."""
+
+import asyncio
+from types import SimpleNamespace
+
+from custom_components.heatmiserneo.hub import HeatmiserNeoHub
+
+
+def _device(device_id):
+    return SimpleNamespace(device_id=device_id, name=f"Zone {device_id}")
+
+
+async def test_lone_command_is_sent_at_once(fake_hub):
+    """With nothing else in flight, a command isn't held back for the batch window."""
+    hub = HeatmiserNeoHub(fake_hub.host, 4242, command_batch_window=5)
+
+    async with asyncio.timeout(1):
+        assert await hub.set_target_temperature(22, [_device(1)])
+
+    assert fake_hub.received("SET_TEMP") == [{"SET_TEMP": [22, ["Zone 1"]]}]
+
+
+async def test_commands_sent_together_are_merged(fake_hub):
+    """The same command for several zones goes in one message, and every caller gets the result."""
+    hub = HeatmiserNeoHub(fake_hub.host, 4242)
+
+    results = await asyncio.gather(*(hub.set_target_temperature(22, [_device(zone)]) for zone in (1, 2, 3)))
+
+    assert results == [True, True, True]
+    assert fake_hub.received("SET_TEMP") == [{"SET_TEMP": [22, ["Zone 1", "Zone 2", "Zone 3"]]}]
+    assert [zone["SET_TEMP"] for zone in fake_hub.zones] == ["22", "22", "22", "21", "21"]
+
+
+async def test_commands_join_while_one_is_in_flight(fake_hub):
+    """While a command is in flight, the same command for other zones waits for the window and is sent once."""
+    fake_hub.reply_delay = 0.2
+    hub = HeatmiserNeoHub(fake_hub.host, 4242, command_batch_window=0.1)
+
+    first = asyncio.create_task(hub.set_frost(True, [_device(1)]))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(hub.set_frost(True, [_device(2)]))
+    await asyncio.sleep(0.02)
+    third = asyncio.create_task(hub.set_frost(True, [_device(3)]))
+
+    assert await asyncio.gather(first, second, third) == [True, True, True]
+    assert fake_hub.received("FROST_ON") == [{"FROST_ON": ["Zone 1"]}, {"FROST_ON": ["Zone 2", "Zone 3"]}]
+
+
+async def test_different_arguments_are_not_merged(fake_hub):
+    """Commands are only merged when everything but the zones is the same."""
+    hub = HeatmiserNeoHub(fake_hub.host, 4242)
+
+    await asyncio.gather(hub.set_target_temperature(22, [_device(1)]), hub.set_target_temperature(19, [_device(2)]))
+
+    assert sorted(fake_hub.received("SET_TEMP"), key=str) == [
+        {"SET_TEMP": [19, ["Zone 2"]]},
+        {"SET_TEMP": [22, ["Zone 1"]]},
+    ]
+
+
+async def test_holds_for_different_zones_are_merged(fake_hub):
+    """A hold carries a device ID of its own, which doesn't keep holds for different zones apart."""
+    hub = HeatmiserNeoHub(fake_hub.host, 4242)
+
+    await asyncio.gather(hub.set_hold(20, 1, 30, [_device(1)]), hub.set_hold(20, 1, 30, [_device(2)]))
+
+    (message,) = fake_hub.received("HOLD")
+    (arguments, names) = message["HOLD"]
+    assert names == ["Zone 1", "Zone 2"]
+    assert {key: value for key, value in arguments.items() if key != "id"} == {"temp": 20, "hours": 1, "minutes": 30}
+
+
+async def test_cancelled_caller_does_not_cancel_the_batch(fake_hub):
+    """The zone that started a batch giving up doesn't stop the other zones' commands from being sent."""
+    fake_hub.reply_delay = 0.05
+    hub = HeatmiserNeoHub(fake_hub.host, 4242)
+
+    first = asyncio.create_task(hub.set_target_temperature(22, [_device(1)]))
+    second = asyncio.create_task(hub.set_target_temperature(22, [_device(2)]))
+    # Both have joined the batch.
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second
+    assert first.cancelled()
+    assert fake_hub.received("SET_TEMP") == [{"SET_TEMP": [22, ["Zone 1", "Zone 2"]]}]
@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for the device index that the coordinator builds once per refresh and every entity reads."""
+
+import time
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.heatmiserneo.entity import HeatmiserNeoEntity
+
+from .conftest import async_add_hub, entry_coordinator, integration_entities
+from .fake_hub import FakeNeoHub
+
+
+async def test_index_covers_every_device(hass, fake_hub):
+    """The index is keyed by device ID and by zone name, and can't be changed by an entity."""
+    entry = await async_add_hub(hass, fake_hub)
+    devices, _ = entry_coordinator(hass, entry).data
+
+    assert len(devices['neo_devices']) == 5
+    for device in devices['neo_devices']:
+        assert devices['neo_devices_by_id'][device.device_id] is device
+        assert devices['neo_devices_by_name'][device.name] is device
+    with pytest.raises(TypeError):
+        devices['neo_devices_by_id'][1] = None
+
+
+async def test_entities_read_the_latest_index(hass, fake_hub):
+    """Each refresh publishes a new index, and the entities show what it holds."""
+    entry = await async_add_hub(hass, fake_hub)
+    coordinator = entry_coordinator(hass, entry)
+    previous_devices, _ = coordinator.data
+
+    fake_hub.zone("Zone 2")["SET_TEMP"] = "18.5"
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    devices, _ = coordinator.data
+    assert devices['neo_devices_by_name']["Zone 2"].target_temperature == 18.5
+    assert previous_devices['neo_devices_by_name']["Zone 2"].target_temperature == 21.0
+    assert hass.states.get("climate.zone_2").attributes["temperature"] == 18.5
+
+
+def _rebuilt_data(self):
+    """Look the device up the way the entities did before the index, building a dict of every device."""
+    (devices, _) = self._coordinator.data
+    return {device.name: device for device in devices['neo_devices']}.get(self._neostat.name)
+
+
+def _time_state_writes(entities, repeats=5):
+    """Return the fastest time, in seconds, to write the state of every entity."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for entity in entities:
+            entity.async_write_ha_state()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("zones", [10, 60, 200])
+async def test_state_write_benchmark(hass, zones):
+    """
+    Time writing the state of every entity with the index, against building a dict of the devices on each read.
+
+    Run with pytest --benchmark -s to see the timings.
+    """
+    hub = FakeNeoHub(zones)
+    await hub.start()
+    try:
+        # The hub's reply for this many zones is more than neohubapi reads over the legacy API.
+        await async_add_hub(hass, hub, websocket=True)
+        entities = integration_entities(hass)
+
+        indexed = _time_state_writes(entities)
+        with patch.object(HeatmiserNeoEntity, "data", property(_rebuilt_data)):
+            rebuilt = _time_state_writes(entities)
+    finally:
+        await hub.stop()
+
+    print(
+        f"\n{zones} zones, {len(entities)} entities: "
+        f"{rebuilt * 1000:.2f} ms rebuilding the devices, {indexed * 1000:.2f} ms with the index"
+    )
+    # With fewer devices the rest of a state write outweighs the lookups, so the difference is lost in the noise.
+    if zones >= 200:
+        assert indexed < rebuilt
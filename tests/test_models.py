@@ -0,0 +1,146 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for NeoDevice, the immutable device data the coordinator builds once per refresh."""
+
+import gc
+import json
+import tracemalloc
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from neohubapi.neostat import NeoStat
+
+from custom_components.heatmiserneo.const import DeviceCapability
+from custom_components.heatmiserneo.models import NeoDevice
+
+from .conftest import async_add_hub, entry_coordinator
+from .fake_hub import zone_data
+
+
+def _hub_data(zone):
+    """Return a zone's data as neohubapi decodes it, with the engineers data merged in."""
+    return json.loads(json.dumps({**zone, "ENG_FLOOR_LIMIT": 28}), object_hook=lambda item: SimpleNamespace(**item))
+
+
+def test_hub_data_is_parsed():
+    """Numbers are parsed from the hub's strings, and the hold time into a timedelta."""
+    device = NeoDevice.from_hub_data(_hub_data(zone_data(3, HOLD_ON=True, HOLD_TIME="1:30")), "SN3", "C")
+
+    assert device.device_id == 3
+    assert device.name == "Zone 3"
+    assert device.serial_number == "SN3"
+    assert device.temperature == 20.5
+    assert device.target_temperature == 21.0
+    assert device.hold_temp == 20.0
+    assert device.hold_time == timedelta(hours=1, minutes=30)
+    assert device.hold_time_text == "1:30"
+    assert DeviceCapability.HEAT in device.capabilities
+    assert device.available_modes == ("heat",)
+
+
+def test_readings_out_of_range():
+    """Readings out of range are None, and only the temperature is reported as invalid."""
+    device = NeoDevice.from_hub_data(_hub_data(zone_data(1, ACTUAL_TEMP="255.255")), "SN1", "C")
+
+    assert device.temperature is None
+    # Reported by devices without a floor probe.
+    assert device.current_floor_temperature is None
+    assert device.invalid_readings == ("ACTUAL_TEMP",)
+
+
+@pytest.mark.parametrize("temperature_unit", ["C", "F"])
+def test_no_floor_probe(temperature_unit):
+    """127 means there is no floor probe, in Fahrenheit too where it would be a valid reading."""
+    device = NeoDevice.from_hub_data(_hub_data(zone_data(1, CURRENT_FLOOR_TEMPERATURE=127)), "SN1", temperature_unit)
+
+    assert device.current_floor_temperature is None
+    assert device.invalid_readings == ()
+
+
+def test_floor_temperature_in_fahrenheit():
+    """A floor probe's reading is kept in Fahrenheit, it is only 127 that means no probe."""
+    device = NeoDevice.from_hub_data(_hub_data(zone_data(1, CURRENT_FLOOR_TEMPERATURE=77)), "SN1", "F")
+
+    assert device.current_floor_temperature == 77.0
+
+
+async def test_no_floor_sensor_on_a_fahrenheit_hub(hass, fake_hub):
+    """A Fahrenheit hub's thermostats without a floor probe don't get a floor temperature sensor."""
+    fake_hub.system["CORF"] = "F"
+    fake_hub.zone("Zone 2")["CURRENT_FLOOR_TEMPERATURE"] = 77
+    await async_add_hub(hass, fake_hub)
+
+    floor_sensors = [state.entity_id for state in hass.states.async_all("sensor") if "floor_temperature" in state.entity_id]
+    assert floor_sensors == ["sensor.zone_2_heatmiser_neostat_v2_floor_temperature"]
+
+
+def test_devices_are_immutable():
+    """Devices can't be changed, replace() returns a changed copy."""
+    device = NeoDevice.from_hub_data(_hub_data(zone_data(1)), "SN1", "C")
+
+    with pytest.raises(AttributeError):
+        device.target_temperature = 25
+    with pytest.raises(AttributeError):
+        device.extra = True
+
+    held = device.replace(hold_on=True, hold_time=timedelta(minutes=5))
+    assert device.hold_on is False
+    assert held.hold_on is True
+    assert held.hold_time_text == "0:05"
+    assert held != device
+    assert held.replace(hold_on=False, hold_time=device.hold_time) == device
+
+
+async def test_patched_device_replaces_the_old_one(hass, fake_hub):
+    """An optimistic change replaces the device in the coordinator's data, the previous data is left alone."""
+    entry = await async_add_hub(hass, fake_hub)
+    coordinator = entry_coordinator(hass, entry)
+    previous_devices, _ = coordinator.data
+
+    patched = coordinator.async_patch_device(1, target_temperature=25.0)
+
+    devices, _ = coordinator.data
+    assert devices['neo_devices_by_id'][1] is patched
+    assert devices['neo_devices_by_name']["Zone 1"] is patched
+    assert previous_devices['neo_devices_by_id'][1].target_temperature == 21.0
+    assert hass.states.get("climate.zone_1").attributes["temperature"] == 25.0
+
+
+def _retained_memory(build):
+    """Return the bytes still allocated by what build() returns, and what it returned."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        built = build()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return retained, built
+
+
+@pytest.mark.benchmark
+def test_memory_benchmark():
+    """
+    Measure the memory held by 500 devices, against the NeoStat objects they replaced.
+
+    Run with pytest --benchmark -s to see the sizes.
+    """
+    hub_data = [_hub_data(zone_data(device_id)) for device_id in range(1, 501)]
+
+    def neostats():
+        devices = []
+        for data in hub_data:
+            # As before, neohubapi's NeoStat with the serial number added.
+            device = NeoStat(None, data)
+            device.serial_number = "SN"
+            devices.append(device)
+        return devices
+
+    neostat_bytes, _ = _retained_memory(neostats)
+    neo_device_bytes, _ = _retained_memory(lambda: [NeoDevice.from_hub_data(data, "SN", "C") for data in hub_data])
+
+    print(
+        f"\n500 devices: {neostat_bytes / 1024:.0f} KiB as NeoStat, {neo_device_bytes / 1024:.0f} KiB as NeoDevice"
+    )
+    assert neo_device_bytes < neostat_bytes
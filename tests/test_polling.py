@@ -0,0 +1,77 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for the time between refreshes, while the hub answers and while it doesn't."""
+
+import logging
+from datetime import timedelta
+
+from .conftest import async_add_hub, entry_coordinator
+
+
+async def test_unreachable_hub_is_retried_less_often(hass, fake_hub, caplog):
+    """Attempts to reach a hub that has gone away double up to the maximum interval, and the failure is logged once."""
+    entry = await async_add_hub(hass, fake_hub)
+    coordinator = entry_coordinator(hass, entry)
+
+    await fake_hub.stop()
+    caplog.clear()
+    intervals = []
+    for _ in range(5):
+        await coordinator.async_refresh()
+        intervals.append(coordinator._scan_interval)
+
+    assert intervals == [20, 40, 80, 120, 120]
+    assert not coordinator.last_update_success
+    errors = [
+        record for record in caplog.records
+        if record.levelno >= logging.ERROR and record.name.startswith("custom_components.heatmiserneo")
+    ]
+    assert len(errors) == 1
+    assert "Error communicating with the hub" in errors[0].message
+
+    await fake_hub.start()
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+
+
+async def test_unreachable_websocket_hub_is_retried_at_least_a_minute_apart(hass, fake_hub):
+    """The WebSocket API's short maximum interval doesn't apply to a hub that isn't answering."""
+    entry = await async_add_hub(hass, fake_hub, websocket=True)
+    coordinator = entry_coordinator(hass, entry)
+
+    await fake_hub.stop()
+    await fake_hub.disconnect()
+    intervals = []
+    for _ in range(6):
+        await coordinator.async_refresh()
+        intervals.append(coordinator._scan_interval)
+
+    assert intervals == [4, 8, 16, 32, 60, 60]
+
+
+def _slot_offset(coordinator):
+    """Return the seconds between the scheduled refresh and the nearest of the hub's slots."""
+    interval = coordinator._scan_interval
+    when = coordinator._unsub_refresh.__self__.when()
+    return (when - coordinator.poll_phase * interval + interval / 2) % interval - interval / 2
+
+
+async def test_refreshes_are_scheduled_in_the_hubs_slot(hass, fake_hub):
+    """The wait for each refresh is shortened to land in the hub's slot, update_interval stays the whole interval."""
+    entry = await async_add_hub(hass, fake_hub)
+    coordinator = entry_coordinator(hass, entry)
+    coordinator.poll_phase = 0.25
+    coordinator._active_until = 0
+
+    for _ in range(3):
+        await coordinator.async_refresh()
+        assert coordinator.update_interval == timedelta(seconds=coordinator._scan_interval)
+        # Home Assistant schedules from the time rounded down to the second, plus a fraction of a second of its own.
+        assert abs(_slot_offset(coordinator)) < 1
+
+    # A failed refresh is retried after the backed off interval, not the wait for the last slot.
+    await fake_hub.stop()
+    await coordinator.async_refresh()
+    assert coordinator.update_interval == timedelta(seconds=coordinator._scan_interval)
+    assert abs(_slot_offset(coordinator)) < 1
+    assert coordinator._unsub_refresh.__self__.when() - hass.loop.time() > 1
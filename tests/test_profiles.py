@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for the heating profiles, which are fetched in the background and give the zones their next setpoint."""
+
+import asyncio
+import logging
+
+from homeassistant.const import STATE_UNKNOWN
+from homeassistant.util import dt as dt_util
+
+from .conftest import async_add_hub, entry_coordinator
+
+# Weekdays and weekends alike, as the fake hub's FORMAT is 5DAY/2DAY.
+ZONE_PROFILE = {
+    day: {"wake": ["07:00", 21, 4, True], "leave": ["24:00", 16, 4, True], "sleep": ["22:00", 17, 4, True]}
+    for day in ("monday", "sunday")
+}
+NEXT_SETPOINT = "sensor.zone_1_heatmiser_neostat_v2_next_setpoint"
+
+
+async def _async_wait_for_next_setpoint(hass):
+    """Wait for the profiles fetched in the background to reach the sensor."""
+    async with asyncio.timeout(1):
+        while hass.states.get(NEXT_SETPOINT).state == STATE_UNKNOWN:
+            await asyncio.sleep(0.01)
+
+
+def _expected_next_setpoint():
+    return 17.0 if 7 <= dt_util.now().hour < 22 else 21.0
+
+
+async def test_profiles_give_the_next_setpoint(hass, fake_hub):
+    """The zones' profiles are fetched once, and the next setpoint is worked out from them."""
+    fake_hub.zone_profiles["Zone 1"] = ZONE_PROFILE
+    entry = await async_add_hub(hass, fake_hub)
+
+    await _async_wait_for_next_setpoint(hass)
+
+    assert float(hass.states.get(NEXT_SETPOINT).state) == _expected_next_setpoint()
+    assert hass.states.get("sensor.zone_2_heatmiser_neostat_v2_next_setpoint").state == STATE_UNKNOWN
+    assert len(fake_hub.received("GET_PROFILE_0")) == len(fake_hub.zones)
+
+    # Not fetched again until the hub's profile markers move.
+    await entry_coordinator(hass, entry).async_refresh()
+    await hass.async_block_till_done()
+    assert len(fake_hub.received("GET_PROFILE_0")) == len(fake_hub.zones)
+
+
+async def test_garbled_profiles_are_fetched_again(hass, fake_hub, caplog):
+    """A reply that can't be read leaves the refresh alone, and the profiles are fetched on the next one."""
+    fake_hub.zone_profiles["Zone 1"] = ZONE_PROFILE
+    fake_hub.garbled.add("GET_PROFILE_0")
+    entry = await async_add_hub(hass, fake_hub)
+    coordinator = entry_coordinator(hass, entry)
+
+    async with asyncio.timeout(1):
+        while "Could not fetch the heating profiles" not in caplog.text:
+            await asyncio.sleep(0.01)
+    assert coordinator.last_update_success
+    assert hass.states.get(NEXT_SETPOINT).state == STATE_UNKNOWN
+    assert not [
+        record for record in caplog.records
+        if record.levelno >= logging.ERROR and record.name.startswith("custom_components.heatmiserneo")
+    ]
+
+    fake_hub.garbled.clear()
+    await coordinator.async_refresh()
+    await _async_wait_for_next_setpoint(hass)
+
+    assert float(hass.states.get(NEXT_SETPOINT).state) == _expected_next_setpoint()
@@ -0,0 +1,73 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for the refreshes asked for by entities and commands, which are shared and skipped where they can be."""
+
+import asyncio
+
+from custom_components.heatmiserneo import coordinator as coordinator_module
+
+from .conftest import async_add_hub, entry_coordinator
+from .fake_hub import COMMAND_REPLIES
+
+# Stands in for the settle window, so the tests don't wait for it.
+SETTLE_WINDOW = 0.05
+
+
+async def _add_hub(hass, fake_hub, monkeypatch):
+    """Add the hub, and wait for the refresh the entities ask for as they are added."""
+    monkeypatch.setattr(coordinator_module, "REFRESH_SETTLE_WINDOW", SETTLE_WINDOW)
+    entry = await async_add_hub(hass, fake_hub)
+    await _settle(hass)
+    return entry_coordinator(hass, entry)
+
+
+async def _settle(hass):
+    """Wait for the refreshes asked for to run."""
+    await asyncio.sleep(SETTLE_WINDOW * 4)
+    await hass.async_block_till_done()
+
+
+async def test_requests_made_together_share_one_refresh(hass, fake_hub, monkeypatch):
+    """Requests within the settle window are handled by one refresh, and the requests and refreshes are counted."""
+    coordinator = await _add_hub(hass, fake_hub, monkeypatch)
+    # Every entity asked for a refresh as it was added, and they shared one.
+    entities = coordinator.refresh_requests["requested"]
+    assert entities > 1
+    assert coordinator.refresh_requests["executed"] == 1
+
+    await asyncio.gather(*(coordinator.async_request_refresh() for _ in range(40)))
+    await _settle(hass)
+
+    # Counted separately from the scheduled polls, which can also run during the test.
+    assert coordinator.refresh_requests == {"requested": entities + 40, "executed": 2, "skipped_confirmed": 0}
+
+
+async def test_confirmed_command_is_not_refreshed(hass, fake_hub, monkeypatch):
+    """A change the hub confirmed is shown straight away, without fetching all of the hub's data again."""
+    coordinator = await _add_hub(hass, fake_hub, monkeypatch)
+    requests = dict(coordinator.refresh_requests)
+
+    await hass.services.async_call(
+        "climate", "set_temperature", {"entity_id": "climate.zone_1", "temperature": 23}, blocking=True
+    )
+    await _settle(hass)
+
+    assert coordinator.refresh_requests == {**requests, "skipped_confirmed": 1}
+    assert hass.states.get("climate.zone_1").attributes["temperature"] == 23
+
+
+async def test_unconfirmed_command_is_refreshed(hass, fake_hub, monkeypatch):
+    """A command the hub didn't confirm is followed by a refresh, which shows what the hub did."""
+    coordinator = await _add_hub(hass, fake_hub, monkeypatch)
+    requests = dict(coordinator.refresh_requests)
+    monkeypatch.setitem(COMMAND_REPLIES, "SET_TEMP", {"result": "busy"})
+
+    await hass.services.async_call(
+        "climate", "set_temperature", {"entity_id": "climate.zone_1", "temperature": 23}, blocking=True
+    )
+    await _settle(hass)
+
+    assert coordinator.refresh_requests == {
+        "requested": requests["requested"] + 1, "executed": requests["executed"] + 1, "skipped_confirmed": 0
+    }
+    assert hass.states.get("climate.zone_1").attributes["temperature"] == 23
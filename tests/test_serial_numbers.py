@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for the device ID to serial number map, which is only fetched again when the hub's device list changes."""
+
+import json
+import timeit
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.heatmiserneo.coordinator import HeatmiserNeoCoordinator
+
+from .conftest import async_add_hub, entry_coordinator
+from .fake_hub import FakeNeoHub, zone_data
+
+
+def _serial_numbers(coordinator):
+    devices, _ = coordinator.data
+    return {device.name: device.serial_number for device in devices['neo_devices']}
+
+
+async def test_devices_get_their_serial_numbers(hass, fake_hub):
+    """Each device gets the serial number the hub reports for its ID."""
+    entry = await async_add_hub(hass, fake_hub)
+
+    assert _serial_numbers(entry_coordinator(hass, entry)) == {
+        zone["ZONE_NAME"]: fake_hub.serial_number(zone) for zone in fake_hub.zones
+    }
+
+
+async def test_serial_numbers_fetched_when_device_list_changes(hass, fake_hub):
+    """The serial numbers are fetched at start up, and again only when a device is added."""
+    entry = await async_add_hub(hass, fake_hub)
+    coordinator = entry_coordinator(hass, entry)
+    for _ in range(3):
+        await coordinator.async_refresh()
+    assert len(fake_hub.received("DEVICES_SN")) == 1
+
+    fake_hub.add_zone(6)
+    await coordinator.async_refresh()
+    assert len(fake_hub.received("DEVICES_SN")) == 2
+    assert _serial_numbers(coordinator)["Zone 6"] == "SN000006"
+
+    # Firmware that doesn't move the device list's marker still has the new device noticed.
+    fake_hub.zones.append(zone_data(7))
+    await coordinator.async_refresh()
+    assert len(fake_hub.received("DEVICES_SN")) == 3
+    assert _serial_numbers(coordinator)["Zone 7"] == "SN000007"
+
+
+def test_first_serial_number_is_kept():
+    """A device listed twice keeps the first serial number, and the reply is read in one pass."""
+    reply = SimpleNamespace(**{"Kitchen": [1, "SN1", 1], "Kitchen 2": [1, "SN2", 1], "Hall": [2, "SN3", 1]})
+
+    assert HeatmiserNeoCoordinator._index_serial_numbers(reply) == {1: "SN1", 2: "SN3"}
+
+
+def _namespaces(value):
+    return json.loads(json.dumps(value), object_hook=lambda item: SimpleNamespace(**item))
+
+
+@pytest.mark.benchmark
+def test_serial_number_join_benchmark():
+    """
+    Time giving 200 devices their serial numbers, against scanning the whole reply for every device as before.
+
+    Run with pytest --benchmark -s to see the timings.
+    """
+    hub = FakeNeoHub(200)
+    devices = [SimpleNamespace(DEVICE_ID=zone["DEVICE_ID"]) for zone in hub.zones]
+    reply = _namespaces(hub.answer({"DEVICES_SN": 0}))
+
+    def scan():
+        serial_numbers = vars(reply)
+        return [
+            ([serial[1] for serial in serial_numbers.values() if serial[0] == device.DEVICE_ID] or ["UNKNOWN"])[0]
+            for device in devices
+        ]
+
+    def lookup():
+        serial_numbers = HeatmiserNeoCoordinator._index_serial_numbers(reply)
+        return [serial_numbers.get(device.DEVICE_ID, "UNKNOWN") for device in devices]
+
+    assert scan() == lookup()
+    scanned = min(timeit.repeat(scan, number=20, repeat=5)) / 20
+    looked_up = min(timeit.repeat(lookup, number=20, repeat=5)) / 20
+
+    print(f"\n200 devices: {scanned * 1000:.3f} ms scanning, {looked_up * 1000:.3f} ms building and using the map")
+    assert looked_up < scanned
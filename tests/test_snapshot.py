@@ -0,0 +1,92 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for setting the hub up from the snapshot of its data, and for how often the snapshot is saved."""
+
+import asyncio
+
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.helpers import device_registry as dr
+
+from custom_components.heatmiserneo.const import DOMAIN
+
+from .conftest import async_add_hub, entry_coordinator
+
+
+async def _async_reload(hass, entry):
+    """Unload the entry, which saves the snapshot, and set it up again."""
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_set_up_from_the_snapshot_while_the_hub_is_away(hass, fake_hub):
+    """The entities are set up from the snapshot, unavailable until the hub answers."""
+    entry = await async_add_hub(hass, fake_hub)
+    await fake_hub.stop()
+
+    await _async_reload(hass, entry)
+
+    coordinator = entry_coordinator(hass, entry)
+    assert coordinator.restored
+    assert hass.states.get("climate.zone_1").state == STATE_UNAVAILABLE
+
+    fake_hub.zone("Zone 1")["SET_TEMP"] = "18"
+    await fake_hub.start()
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert not coordinator.restored
+    assert hass.states.get("climate.zone_1").state != STATE_UNAVAILABLE
+    assert hass.states.get("climate.zone_1").attributes["temperature"] == 18
+
+
+async def test_snapshot_is_saved_at_most_every_few_minutes(hass, fake_hub, monkeypatch):
+    """The snapshot is saved after the first refresh, then not again until the save delay has passed."""
+    entry = await async_add_hub(hass, fake_hub)
+    coordinator = entry_coordinator(hass, entry)
+    store = coordinator._snapshot_store
+    assert (await store.async_load())["serial_numbers"]
+
+    saves = []
+    save = store.async_save
+
+    async def async_save(data):
+        saves.append(data)
+        await save(data)
+
+    monkeypatch.setattr(store, "async_save", async_save)
+    for _ in range(3):
+        await coordinator.async_refresh()
+    assert saves == []
+
+    coordinator._next_snapshot_save = 0
+    await coordinator.async_refresh()
+    assert len(saves) == 1
+
+    # Unloading saves the data fetched since.
+    await coordinator.async_refresh()
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    assert len(saves) == 2
+
+
+async def test_hub_is_checked_once_it_answers(hass, fake_hub):
+    """NTP and the hub's firmware version are taken from the hub, not from the snapshot."""
+    entry = await async_add_hub(hass, fake_hub)
+    assert fake_hub.received("NTP_ON") == []
+
+    # The snapshot says NTP is running, the hub has lost it since.
+    fake_hub.change_system(NTP_ON="Stopped", HUB_VERSION=2160)
+    await _async_reload(hass, entry)
+
+    # The first refresh, and enabling NTP, run in the background.
+    async with asyncio.timeout(1):
+        while not fake_hub.received("NTP_ON"):
+            await asyncio.sleep(0.01)
+    assert fake_hub.received("NTP_ON") == [{"NTP_ON": 0}]
+    hub_device = dr.async_get(hass).async_get_device(identifiers={(DOMAIN, f"NEOHUB-SN:000000-{fake_hub.host}")})
+    assert hub_device.sw_version == 2160
+
+    # The hub has NTP running again, so it isn't asked to start it again.
+    await entry_coordinator(hass, entry).async_refresh()
+    assert len(fake_hub.received("NTP_ON")) == 1
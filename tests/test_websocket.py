@@ -0,0 +1,118 @@
+# SPDX-License-Identifier: Apache-2.0 OR GPL-2.0-only
+
+"""Tests for talking to the hub over the token authenticated WebSocket API, and over the legacy API without a token."""
+
+import asyncio
+
+from custom_components.heatmiserneo.config_flow import FlowHandler
+
+from .conftest import async_add_hub, entry_coordinator, entry_hub
+
+
+async def test_websocket_keeps_one_connection(hass, fake_hub):
+    """Every request goes over the connection opened for the first one."""
+    entry = await async_add_hub(hass, fake_hub, websocket=True)
+    coordinator = entry_coordinator(hass, entry)
+    for _ in range(3):
+        await coordinator.async_refresh()
+
+    assert len(fake_hub.received("GET_LIVE_DATA")) == 4
+    assert fake_hub.connections == {"legacy": 0, "websocket": 1}
+    assert entry_hub(hass, entry).stats["connections_opened"] == 1
+    assert hass.states.get("climate.zone_1").attributes["current_temperature"] == 20.5
+
+
+async def test_legacy_api_connects_per_request(hass, fake_hub):
+    """Without a token, each request opens a connection to the legacy API."""
+    entry = await async_add_hub(hass, fake_hub)
+    await entry_coordinator(hass, entry).async_refresh()
+
+    assert fake_hub.connections == {"legacy": len(fake_hub.messages), "websocket": 0}
+    assert hass.states.get("climate.zone_1").attributes["current_temperature"] == 20.5
+
+
+async def test_command_over_websocket(hass, fake_hub):
+    """Commands are sent over the WebSocket, and the hub's change is shown."""
+    await async_add_hub(hass, fake_hub, websocket=True)
+
+    await hass.services.async_call(
+        "climate", "set_temperature", {"entity_id": "climate.zone_1", "temperature": 23}, blocking=True
+    )
+
+    assert fake_hub.received("SET_TEMP") == [{"SET_TEMP": [23, ["Zone 1"]]}]
+    assert hass.states.get("climate.zone_1").attributes["temperature"] == 23
+    assert fake_hub.connections["websocket"] == 1
+
+
+async def test_reconnects_when_the_hub_closes_the_connection(hass, fake_hub):
+    """A connection the hub has closed is replaced on the next request."""
+    entry = await async_add_hub(hass, fake_hub, websocket=True)
+    coordinator = entry_coordinator(hass, entry)
+
+    await fake_hub.disconnect()
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    assert fake_hub.connections["websocket"] == 2
+
+
+async def test_hub_closing_the_connection_while_answering(hass, fake_hub, caplog):
+    """A connection closed while waiting for the hub fails the refresh like any other connection error."""
+    entry = await async_add_hub(hass, fake_hub, websocket=True)
+    coordinator = entry_coordinator(hass, entry)
+    # Out of the way, so that the refresh is what the hub is answering.
+    await coordinator._profiles_task
+
+    fake_hub.reply_delay = 0.2
+    refresh = asyncio.create_task(coordinator.async_refresh())
+    await asyncio.sleep(0.05)
+    await fake_hub.disconnect()
+    await refresh
+
+    assert not coordinator.last_update_success
+    assert "Error communicating with the hub" in caplog.text
+    assert "Unexpected error" not in caplog.text
+
+    fake_hub.reply_delay = 0
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+
+
+async def test_unload_closes_the_connection(hass, fake_hub):
+    """Unloading the entry closes the WebSocket."""
+    entry = await async_add_hub(hass, fake_hub, websocket=True)
+    hub = entry_hub(hass, entry)
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert hub._websocket is None
+    # The hub notices the connection has gone once the closing handshake is over.
+    async with asyncio.timeout(1):
+        while fake_hub.open_websockets:
+            await asyncio.sleep(0.01)
+
+
+async def test_connection_test_checks_the_token(hass, fake_hub):
+    """The config flow only accepts a hub that answers with the token given."""
+    flow = FlowHandler()
+    flow._host = fake_hub.host
+    flow._port = 4243
+
+    flow._token = fake_hub.token
+    assert await flow.try_connection() is None
+
+    flow._token = "wrong-token"
+    assert await flow.try_connection() == "cannot_connect"
+
+
+async def test_quiet_websocket_hub_is_still_polled_often(hass, fake_hub):
+    """The hub can't push changes, so over the WebSocket API a quiet hub is polled at least every 10 seconds."""
+    entry = await async_add_hub(hass, fake_hub, websocket=True)
+    coordinator = entry_coordinator(hass, entry)
+    # Past the activity window that follows start up.
+    coordinator._active_until = 0
+    for _ in range(5):
+        await coordinator.async_refresh()
+
+    assert coordinator.refresh_stats["update_interval_s"] == 10